@@ -3,6 +3,11 @@ BOT_TOKEN = "8487703746:AAFy21089v7-fZXXtiUhIUKgXHDWBYjJaLo"
 ADMINS = [6587587517, 5860311888, 805466040]  # Admin ID lari
 DATABASE_PATH = "optimum.db"
 
+# SQLite ulanish sozlamalari (har bir worker thread uchun bitta doimiy ulanish)
+DB_BUSY_TIMEOUT_MS = 5000          # "database is locked" o'rniga shuncha kutadi
+DB_MMAP_SIZE = 64 * 1024 * 1024    # 64 MB memory-mapped I/O
+DB_CACHED_STATEMENTS = 256         # har bir ulanishdagi prepared statement keshi
+
 CONTACT_INFO = """
 📞 Biz bilan bog'lanish:
 
@@ -1,13 +1,39 @@
 import sqlite3
 import os
 import time
-from config import DATABASE_PATH
+import threading
+from types import MappingProxyType
+from config import DATABASE_PATH, DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHED_STATEMENTS
+from database.migrations import run_migrations, LATEST_VERSION
+from database.ledger import record_points_event, SOURCE_MANUAL, SOURCE_REFERRAL, SOURCE_BONUS
+from database.points_buffer import read_with_pending, flush_points_buffer
 
 
 # ===================== POINTS FORMAT / ROUND =====================
 
 POINTS_DECIMALS = 1  # nuqtadan keyin 1 ta raqam
 
+# DBda ball butun son sifatida saqlanadi: users.points_x10 = ball * 10
+# (0.2 -> 2, -0.5 -> -5). Konvertatsiya faqat shu yerda, API chegarasida.
+POINTS_SCALE = 10
+
+
+def points_to_x10(value) -> int:
+    """Ball (float/int/str) -> points_x10 (int)."""
+    try:
+        return int(round(float(value) * POINTS_SCALE))
+    except Exception:
+        return 0
+
+
+def points_from_x10(value) -> float:
+    """points_x10 (int) -> ball (float, 1 xonagacha)."""
+    try:
+        return round(int(value or 0) / POINTS_SCALE, POINTS_DECIMALS)
+    except Exception:
+        return 0.0
+
+
 def fmt_points(x) -> str:
     """
     UI uchun chiroyli format:
@@ -24,159 +50,150 @@ def fmt_points(x) -> str:
     return s
 
 
-def create_connection():
-    """Ma'lumotlar bazasiga ulanish yaratish"""
-    conn = None
-    try:
-        conn = sqlite3.connect(DATABASE_PATH)
+# ===================== ULANISH MENEJERI =====================
+#
+# Har bir worker thread (TeleBot pool, backup, ...) o'zining bitta doimiy
+# ulanishini ishlatadi. Ulanish birinchi so'rovda ochiladi va thread umri
+# davomida qayta ishlatiladi: fayl ochish, schema parse va PRAGMA'lar faqat
+# bir marta bo'ladi.
+
+_local = threading.local()
+
+# reset_connections() chaqirilganda oshadi -> threadlar ulanishni qayta ochadi
+_conn_generation = 0
+
+
+def _open_connection():
+    """Yangi sozlangan ulanish (WAL, busy_timeout, mmap, statement cache)."""
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_CACHED_STATEMENTS,
+    )
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    return conn
+
+
+def get_connection():
+    """
+    Joriy thread uchun doimiy ulanish.
+    MUHIM: qaytgan ulanishni close() qilmang - u keyingi so'rovlarda ham ishlatiladi.
+    Yozish uchun `with conn:` ishlating (commit / xatoda rollback).
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _conn_generation:
         return conn
-    except sqlite3.Error as e:
-        print(f"Xatolik: {e}")
+
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    conn = _open_connection()
+    _local.conn = conn
+    _local.generation = _conn_generation
     return conn
 
 
-def init_database():
-    """Ma'lumotlar bazasini ishga tushirish"""
-    conn = create_connection()
+def reset_connections():
+    """
+    Barcha threadlar keyingi so'rovda ulanishni qayta ochishi uchun.
+    (masalan, restore'dan keyin)
+    """
+    global _conn_generation
+    _conn_generation += 1
+
+
+def close_connection():
+    """Joriy thread ulanishini yopish (thread tugashidan oldin chaqirish mumkin)."""
+    conn = getattr(_local, "conn", None)
     if conn is not None:
         try:
-            cursor = conn.cursor()
-
-            # Kurslar jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS courses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL UNIQUE
-                )
-            ''')
-
-            # ✅ BONUS CLAIMS
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bonus_claims (
-                    user_id INTEGER PRIMARY KEY,
-                    last_claim_ts INTEGER NOT NULL
-                )
-            ''')
-
-            # Kurs ma'lumotlari jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS course_details (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_id INTEGER NOT NULL,
-                    price TEXT,
-                    schedule TEXT,
-                    description TEXT,
-                    image_path TEXT,
-                    FOREIGN KEY (course_id) REFERENCES courses (id)
-                )
-            ''')
-
-            # O'qituvchilar jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS teachers (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_id INTEGER NOT NULL,
-                    full_name TEXT NOT NULL,
-                    achievements TEXT,
-                    image_path TEXT,
-                    FOREIGN KEY (course_id) REFERENCES courses (id)
-                )
-            ''')
-
-            # Talabalar jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS students (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    full_name TEXT NOT NULL,
-                    phone_number TEXT NOT NULL,
-                    username TEXT,
-                    course_id INTEGER,
-                    registered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    approved BOOLEAN DEFAULT FALSE,
-                    FOREIGN KEY (course_id) REFERENCES courses (id)
-                )
-            ''')
-
-            # E'lonlar jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS announcements (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message TEXT NOT NULL,
-                    image_path TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 🎬 Kurs videosi ko‘rganlar
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS course_video_views (
-                    user_id INTEGER PRIMARY KEY,
-                    viewed_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Admin guruhlari jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS admin_groups (
-                    group_id INTEGER PRIMARY KEY,
-                    group_title TEXT NOT NULL,
-                    added_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # Foydalanuvchilar jadvali
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INTEGER PRIMARY KEY,
-                    username TEXT,
-                    full_name TEXT,
-                    points REAL DEFAULT 0,
-                    referrals_count INTEGER DEFAULT 0,
-                    joined_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # 🔥 Yangi ustunlar: points, referrals_count
-            # IMPORTANT: points REAL bo'lsin (0.2 / 0.5 uchun)
-            try:
-                cursor.execute("ALTER TABLE users ADD COLUMN points REAL DEFAULT 0.0")
-            except sqlite3.OperationalError:
-                pass
+            conn.close()
+        except Exception:
+            pass
+        _local.conn = None
 
-            try:
-                cursor.execute("ALTER TABLE users ADD COLUMN referrals_count INTEGER DEFAULT 0")
-            except sqlite3.OperationalError:
-                pass
-
-            # 🔥 Yangi jadval: referrals
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS referrals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    referrer_id INTEGER NOT NULL,
-                    referred_id INTEGER NOT NULL UNIQUE,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (referrer_id) REFERENCES users (user_id),
-                    FOREIGN KEY (referred_id) REFERENCES users (user_id)
-                )
-            ''')
-
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS gift_likes (
-                    user_id INTEGER PRIMARY KEY,
-                    liked_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            conn.commit()
-            print("✅ Ma'lumotlar bazasi muvaffaqiyatli yaratildi!")
+
+def backup_to_file(dest_path: str):
+    """
+    Ishlab turgan bazaning izchil nusxasi (WAL ichidagi o'zgarishlar ham kiradi).
+    Faylni to'g'ridan-to'g'ri ko'chirish WAL rejimida oxirgi yozuvlarni yo'qotadi.
+    """
+    dest = sqlite3.connect(dest_path)
+    try:
+        get_connection().backup(dest)
+    finally:
+        dest.close()
+
+
+def restore_from_file(src_path: str):
+    """
+    Backup faylidagi bazani ishlab turgan bazaga SQLite backup API orqali yozadi.
+    Fayl almashtirilmaydi, shuning uchun ochiq ulanishlar ham yangi ma'lumotni ko'radi.
+    """
+    global _gift_likes_total
+
+    src = sqlite3.connect(src_path)
+    try:
+        src.backup(get_connection())
+    finally:
+        src.close()
+    reset_connections()
+
+    # Eski backup eski sxemada bo'lishi mumkin -> yetishmagan migratsiyalarni qo'llaymiz
+    run_migrations(get_connection())
+    refresh_catalog()
+    notify_points_changed(None)
+    _gift_likes_total = None
+
+
+def init_database():
+    """
+    Ma'lumotlar bazasini ishga tushirish.
+    Sxema database/migrations.py dagi versiyalangan migratsiyalar orqali yuritiladi;
+    versiya dolzarb bo'lsa hech qanday DDL bajarilmaydi.
+    """
+    conn = get_connection()
+    if conn is not None:
+        try:
+            applied = run_migrations(conn)
+            if applied:
+                print("✅ Ma'lumotlar bazasi muvaffaqiyatli yaratildi!")
+            else:
+                print(f"✅ Ma'lumotlar bazasi sxemasi dolzarb (v{LATEST_VERSION})")
+            refresh_catalog()
         except sqlite3.Error as e:
             print(f"Xatolik: {e}")
-        finally:
-            conn.close()
     else:
         print("❌ Ma'lumotlar bazasiga ulanib bo'lmadi!")
 
 
+# ===================== BALL O'ZGARISHI TINGLOVCHILARI =====================
+# Xotiradagi reyting (utils/leaderboard.py) kabi keshlar shu orqali yangilanadi.
+# Chaqiruv commitdan keyin bo'ladi; user_ids=None -> "hammasi o'zgardi" (restore).
+
+_points_listeners = []
+
+
+def add_points_listener(callback):
+    """callback(user_ids: list | None) - ball/taklif/user o'zgarganda chaqiriladi."""
+    if callback not in _points_listeners:
+        _points_listeners.append(callback)
+
+
+def notify_points_changed(user_ids):
+    for callback in list(_points_listeners):
+        try:
+            callback(user_ids)
+        except Exception as e:
+            print(f"[points_listener] xatolik: {e}")
+
+
 # ----------- YORDAMCHI: rasmlarni o'chirish -----------
 
 def _delete_file_if_exists(path: str):
@@ -187,167 +204,245 @@ def _delete_file_if_exists(path: str):
             print(f"Rasmni o'chirishda xatolik ({path}): {e}")
 
 
+# ===================== KATALOG SNAPSHOT =====================
+# Kurslar, kurs ma'lumotlari va o'qituvchilar faqat admin o'zgartirganda
+# o'zgaradi. O'quvchilar (menyu, info_/teacher_/register_ callbacklar,
+# keyboards/inline.py) DBga emas, xotiradagi o'zgarmas snapshotga murojaat
+# qiladi. Admin o'zgarishi commit bo'lgach yangi snapshot quriladi va bitta
+# havola almashtiriladi - o'quvchilar lock olmaydi.
+
+_catalog = None
+_catalog_version = 0
+_catalog_lock = threading.Lock()
+
+
+def _build_catalog(version: int):
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id, name FROM courses ORDER BY name")
+        courses = tuple(cursor.fetchall())
+
+        # Kurs kartochkalari: kurs + ma'lumot + ustoz bitta JOIN bilan.
+        # Kurs uchun birinchi (eng eski) yozuv olinadi - avvalgi fetchone() bilan bir xil.
+        details = {}
+        teacher_by_course = {}
+        cards = {}
+        cursor.execute('''
+            SELECT c.id, c.name,
+                   cd.id, cd.price, cd.schedule, cd.description, cd.image_path,
+                   t.id, t.full_name, t.achievements, t.image_path
+            FROM courses c
+            LEFT JOIN course_details cd ON cd.id = (
+                SELECT MIN(id) FROM course_details WHERE course_id = c.id
+            )
+            LEFT JOIN teachers t ON t.id = (
+                SELECT MIN(id) FROM teachers WHERE course_id = c.id
+            )
+        ''')
+        for (course_id, name, details_id, price, schedule, description, image_path,
+             teacher_id, full_name, achievements, teacher_image) in cursor.fetchall():
+            course_details = None
+            teacher = None
+            if details_id is not None:
+                course_details = (price, schedule, description, image_path, name)
+                details[course_id] = course_details
+            if teacher_id is not None:
+                teacher = (teacher_id, full_name, achievements, teacher_image)
+                teacher_by_course[course_id] = teacher
+            cards[course_id] = MappingProxyType({
+                "course_id": course_id,
+                "name": name,
+                "details": course_details,
+                "teacher": teacher,
+            })
+
+        cursor.execute("SELECT id, course_id, full_name FROM teachers ORDER BY full_name")
+        teachers = tuple(cursor.fetchall())
+    finally:
+        cursor.close()
+
+    return MappingProxyType({
+        "version": version,
+        "courses": courses,
+        "details": MappingProxyType(details),
+        "teachers": teachers,
+        "teacher_by_course": MappingProxyType(teacher_by_course),
+        "cards": MappingProxyType(cards),
+    })
+
+
+def refresh_catalog():
+    """Katalogni DBdan qayta quradi (admin o'zgarishlaridan keyin chaqiriladi)."""
+    global _catalog, _catalog_version
+    with _catalog_lock:
+        snapshot = _build_catalog(_catalog_version + 1)
+        _catalog = snapshot
+        _catalog_version = snapshot["version"]
+
+
+def _get_catalog():
+    snapshot = _catalog
+    if snapshot is None:
+        refresh_catalog()
+        snapshot = _catalog
+    return snapshot
+
+
+def _as_id(value):
+    # callback_data dan kelgan "3" ham 3 deb topilsin (SQLite ham shunday solishtirardi)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def get_catalog_version() -> int:
+    """Katalog har qayta qurilganda o'sadi (bog'liq keshlar uchun)."""
+    return _get_catalog()["version"]
+
+
 # ----------- KURS OPERATSIYALARI -----------
 
 def get_courses():
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM courses ORDER BY name")
-    courses = cursor.fetchall()
-    conn.close()
-    return courses
+    return list(_get_catalog()["courses"])
 
 
 def get_course_details(course_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT cd.price, cd.schedule, cd.description, cd.image_path, c.name
-        FROM course_details cd
-        JOIN courses c ON cd.course_id = c.id
-        WHERE cd.course_id = ?
-    ''', (course_id,))
-    course_info = cursor.fetchone()
-    conn.close()
-    return course_info
+    return _get_catalog()["details"].get(_as_id(course_id))
 
 
 def add_course(name):
-    conn = create_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("INSERT INTO courses (name) VALUES (?)", (name,))
-        conn.commit()
-        return True
+        with conn:
+            conn.execute("INSERT INTO courses (name) VALUES (?)", (name,))
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
+    refresh_catalog()
+    return True
 
 
 def add_course_details(course_id, price, schedule, description, image_path):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO course_details (course_id, price, schedule, description, image_path) VALUES (?, ?, ?, ?, ?)",
-        (course_id, price, schedule, description, image_path)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO course_details (course_id, price, schedule, description, image_path) VALUES (?, ?, ?, ?, ?)",
+            (course_id, price, schedule, description, image_path)
+        )
+    refresh_catalog()
 
 
 def delete_course(course_id):
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT image_path FROM course_details WHERE course_id = ?", (course_id,))
-        for (img,) in cursor.fetchall():
-            _delete_file_if_exists(img)
-
-        cursor.execute("SELECT image_path FROM teachers WHERE course_id = ?", (course_id,))
-        for (img,) in cursor.fetchall():
-            _delete_file_if_exists(img)
-
-        cursor.execute("DELETE FROM course_details WHERE course_id = ?", (course_id,))
-        cursor.execute("DELETE FROM teachers WHERE course_id = ?", (course_id,))
-        cursor.execute("DELETE FROM students WHERE course_id = ?", (course_id,))
-        cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
-        conn.commit()
-        return True
+        with conn:
+            cursor.execute("SELECT image_path FROM course_details WHERE course_id = ?", (course_id,))
+            for (img,) in cursor.fetchall():
+                _delete_file_if_exists(img)
+
+            cursor.execute("SELECT image_path FROM teachers WHERE course_id = ?", (course_id,))
+            for (img,) in cursor.fetchall():
+                _delete_file_if_exists(img)
+
+            cursor.execute("DELETE FROM course_details WHERE course_id = ?", (course_id,))
+            cursor.execute("DELETE FROM teachers WHERE course_id = ?", (course_id,))
+            cursor.execute("DELETE FROM students WHERE course_id = ?", (course_id,))
+            cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
     except sqlite3.Error as e:
         print(f"Kursni o'chirishda xatolik: {e}")
         return False
-    finally:
-        conn.close()
+    refresh_catalog()
+    return True
 
 
 # ----------- O'QITUVCHI OPERATSIYALARI -----------
 
+def get_course_card(course_id):
+    """
+    Kurs kartochkasi: bitta strukturada kurs, ma'lumot va ustoz.
+    return: {"course_id", "name", "details": (price, schedule, description,
+             image_path, name) | None, "teacher": (id, full_name, achievements,
+             image_path) | None} yoki kurs bo'lmasa None.
+    Katalog bilan birga init_database da isitiladi.
+    """
+    return _get_catalog()["cards"].get(_as_id(course_id))
+
+
 def get_teacher(course_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, full_name, achievements, image_path FROM teachers WHERE course_id = ?", (course_id,))
-    teacher_info = cursor.fetchone()
-    conn.close()
-    return teacher_info
+    return _get_catalog()["teacher_by_course"].get(_as_id(course_id))
 
 
 def get_all_teachers():
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, course_id, full_name FROM teachers ORDER BY full_name")
-    teachers = cursor.fetchall()
-    conn.close()
-    return teachers
+    return list(_get_catalog()["teachers"])
 
 
 def add_teacher(course_id, full_name, achievements, image_path):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO teachers (course_id, full_name, achievements, image_path) VALUES (?, ?, ?, ?)",
-        (course_id, full_name, achievements, image_path)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO teachers (course_id, full_name, achievements, image_path) VALUES (?, ?, ?, ?)",
+            (course_id, full_name, achievements, image_path)
+        )
+    refresh_catalog()
 
 
 def delete_teacher(teacher_id):
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT image_path FROM teachers WHERE id = ?", (teacher_id,))
-        row = cursor.fetchone()
-        if row:
-            _delete_file_if_exists(row[0])
+        with conn:
+            cursor.execute("SELECT image_path FROM teachers WHERE id = ?", (teacher_id,))
+            row = cursor.fetchone()
+            if row:
+                _delete_file_if_exists(row[0])
 
-        cursor.execute("DELETE FROM teachers WHERE id = ?", (teacher_id,))
-        conn.commit()
-        return True
+            cursor.execute("DELETE FROM teachers WHERE id = ?", (teacher_id,))
     except sqlite3.Error as e:
         print(f"O'qituvchini o'chirishda xatolik: {e}")
         return False
-    finally:
-        conn.close()
+    refresh_catalog()
+    return True
 
 
 # ----------- TALABA OPERATSIYALARI -----------
 
-def add_student(full_name, phone_number, username, course_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO students (full_name, phone_number, username, course_id) VALUES (?, ?, ?, ?)",
-        (full_name, phone_number, username, course_id)
-    )
-    conn.commit()
-    conn.close()
-
-
-def approve_student(full_name, phone_number, course_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE students SET approved = TRUE WHERE full_name = ? AND phone_number = ? AND course_id = ?",
-        (full_name, phone_number, course_id)
-    )
-    conn.commit()
-    conn.close()
-
-
-def delete_student(full_name, phone_number, course_id):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "DELETE FROM students WHERE full_name = ? AND phone_number = ? AND course_id = ?",
-        (full_name, phone_number, course_id)
-    )
-    conn.commit()
-    conn.close()
+def add_student(full_name, phone_number, username, course_id) -> int:
+    """
+    Upsert: (phone_number, course_id) allaqachon bo'lsa ism/username yangilanadi
+    (qayta urinish takror qator qo'shmaydi). return: talaba id si.
+    """
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO students (full_name, phone_number, username, course_id, registered_ts)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(phone_number, course_id) DO UPDATE SET
+                full_name = excluded.full_name,
+                username = excluded.username
+        ''', (full_name, phone_number, username, course_id, int(time.time())))
+        row = conn.execute(
+            "SELECT id FROM students WHERE phone_number = ? AND course_id = ?",
+            (phone_number, course_id)
+        ).fetchone()
+    return row[0]
+
+
+def approve_student(student_id: int):
+    conn = get_connection()
+    with conn:
+        conn.execute("UPDATE students SET approved = TRUE WHERE id = ?", (student_id,))
+
+
+def delete_student(student_id: int):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM students WHERE id = ?", (student_id,))
 
 
 def get_approved_students():
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT s.id, s.full_name, s.phone_number, s.username, s.registered_at, c.name
@@ -355,73 +450,59 @@ def get_approved_students():
         LEFT JOIN courses c ON s.course_id = c.id
         WHERE s.approved = TRUE
     ''')
-    students = cursor.fetchall()
-    conn.close()
-    return students
+    return cursor.fetchall()
 
 
 # ----------- E'LON OPERATSIYALARI -----------
 
 def get_announcements():
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT message, image_path FROM announcements ORDER BY created_at DESC LIMIT 5")
-    announcements = cursor.fetchall()
-    conn.close()
-    return announcements
+    return cursor.fetchall()
 
 
 def add_announcement(message, image_path=None):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO announcements (message, image_path) VALUES (?, ?)",
-        (message, image_path)
-    )
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT INTO announcements (message, image_path) VALUES (?, ?)",
+            (message, image_path)
+        )
 
 
 # ----------- GURUH OPERATSIYALARI -----------
 
 def add_admin_group(group_id, group_title):
-    conn = create_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute(
-            "INSERT OR REPLACE INTO admin_groups (group_id, group_title) VALUES (?, ?)",
-            (group_id, group_title)
-        )
-        conn.commit()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO admin_groups (group_id, group_title) VALUES (?, ?)",
+                (group_id, group_title)
+            )
         return True
     except sqlite3.Error as e:
         print(f"Guruh qo'shishda xatolik: {e}")
         return False
-    finally:
-        conn.close()
 
 
 def get_all_admin_groups():
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT group_id, group_title FROM admin_groups ORDER BY group_title")
-    groups = cursor.fetchall()
-    conn.close()
-    return groups
+    return cursor.fetchall()
 
 
 def delete_admin_group(group_id):
-    conn = create_connection()
-    cursor = conn.cursor()
+    conn = get_connection()
     try:
-        cursor.execute("DELETE FROM admin_groups WHERE group_id = ?", (group_id,))
-        conn.commit()
+        with conn:
+            conn.execute("DELETE FROM admin_groups WHERE group_id = ?", (group_id,))
         return True
     except sqlite3.Error as e:
         print(f"Guruh o'chirishda xatolik: {e}")
         return False
-    finally:
-        conn.close()
 
 
 # ----------- USER OPERATSIYALARI -----------
@@ -430,115 +511,162 @@ def add_user(user_id, username, full_name):
     """
     Foydalanuvchini qo'shish yoki yangilash.
     REPLACE emas, ON CONFLICT UPDATE (points yo'qolmasin)
+    Qaytib kelgan (avval botni bloklagan) user yana yetkaziladigan bo'ladi.
     """
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO users (user_id, username, full_name)
-        VALUES (?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            username = excluded.username,
-            full_name = excluded.full_name
-    ''', (user_id, username, full_name))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            INSERT INTO users (user_id, username, full_name, joined_ts)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = excluded.username,
+                full_name = excluded.full_name,
+                reachable = 1,
+                blocked_at = NULL
+        ''', (user_id, username, full_name, int(time.time())))
+    notify_points_changed([user_id])
 
 
-def get_all_users():
-    conn = create_connection()
+def user_exists(user_id: int) -> bool:
+    """users jadvalida user bor-yo'qligi ('yangi user' sharti uchun)."""
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT user_id FROM users")
-    users = cursor.fetchall()
-    conn.close()
-    return [u[0] for u in users]
+    cursor.execute("SELECT 1 FROM users WHERE user_id = ? LIMIT 1", (user_id,))
+    return cursor.fetchone() is not None
+
+
+def iter_reachable_user_ids(batch_size: int = 1000):
+    """
+    Yetkazib bo'ladigan (reachable = 1) user_id lar, o'sish tartibida.
+    Keyset bo'yicha batch_size tadan o'qiladi (idx_users_reachable qisman indeksi),
+    ro'yxat yig'ilmaydi. Generator - e'lon navbati uchun.
+    """
+    conn = get_connection()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            "SELECT user_id FROM users WHERE reachable = 1 AND user_id > ? ORDER BY user_id LIMIT ?",
+            (last_id, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        for (user_id,) in rows:
+            yield user_id
+        last_id = rows[-1][0]
+
+
+def mark_users_unreachable(user_ids):
+    """403 (botni bloklagan / akkaunt o'chirilgan) - yetkazib bo'lmaydi."""
+    params = [(int(time.time()), int(u)) for u in user_ids if u and int(u) > 0]
+    if not params:
+        return
+    try:
+        conn = get_connection()
+        with conn:
+            conn.executemany(
+                "UPDATE users SET reachable = 0, blocked_at = ? WHERE user_id = ? AND reachable = 1",
+                params
+            )
+    except sqlite3.Error as e:
+        print(f"Userni yetkazib bo'lmaydigan deb belgilashda xatolik: {e}")
 
 
 def get_user_stats(user_id):
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT user_id, username, full_name, joined_at,
-               ROUND(COALESCE(points, 0), 1), COALESCE(referrals_count, 0)
+               points_x10 / 10.0, COALESCE(referrals_count, 0)
         FROM users
         WHERE user_id = ?
     ''', (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    return cursor.fetchone()
 
 
 # ----------- BALLAR VA TAKLIFLAR (POINTS / REFERRALS) -----------
 
-def add_points(user_id: int, amount):
+def add_points(user_id: int, amount, source: str = SOURCE_MANUAL):
     """
     Foydalanuvchiga ball qo'shish (+ yoki - bo'lishi mumkin).
-    DBda doim 1 xonagacha ROUND qilib saqlaydi.
+    1 xonagacha aniq: DBda butun son (points_x10) sifatida qo'shiladi.
+    source: jurnal uchun manba (quiz, fastwords, admin, ...).
     """
-    try:
-        amount = float(amount)
-    except Exception:
-        amount = 0.0
+    delta_x10 = points_to_x10(amount)
 
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users
-        SET points = ROUND(COALESCE(points, 0) + ?, 1)
-        WHERE user_id = ?
-    ''', (amount, user_id))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        cursor = conn.execute('''
+            UPDATE users
+            SET points_x10 = points_x10 + ?
+            WHERE user_id = ?
+        ''', (delta_x10, user_id))
+        updated = cursor.rowcount > 0
+
+    if updated:
+        record_points_event(user_id, delta_x10, source)
+        notify_points_changed([user_id])
 
 
 def get_points(user_id: int) -> float:
-    """Foydalanuvchining ballarini olish (1 xonagacha)."""
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT COALESCE(points, 0) FROM users WHERE user_id = ?", (user_id,))
-    row = cursor.fetchone()
-    conn.close()
-    try:
-        return round(float(row[0] if row else 0.0), 1)
-    except Exception:
-        return 0.0
+    """
+    Foydalanuvchining ballarini olish (1 xonagacha).
+    Buferdagi (hali yozilmagan) quiz/tezkor so'z ballari ham qo'shiladi.
+    """
+    def read_x10():
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT points_x10 FROM users WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        return row[0] if row else 0
 
+    return points_from_x10(read_with_pending(user_id, read_x10))
 
-def set_points(user_id: int, value):
-    """Foydalanuvchining ballini to'g'ridan-to'g'ri o'rnatish (1 xonagacha)."""
-    try:
-        value = float(value)
-    except Exception:
-        value = 0.0
 
-    conn = create_connection()
+def set_points(user_id: int, value, source: str = SOURCE_MANUAL):
+    """
+    Foydalanuvchining ballini to'g'ridan-to'g'ri o'rnatish (1 xonagacha).
+    Jurnalga eski va yangi qiymat farqi yoziladi.
+    """
+    value_x10 = points_to_x10(value)
+
+    # buferdagi deltalar o'rnatilgan qiymat ustiga keyin qo'shilib ketmasin
+    flush_points_buffer()
+
+    conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users
-        SET points = ROUND(?, 1)
-        WHERE user_id = ?
-    ''', (value, user_id))
-    conn.commit()
-    conn.close()
+    with conn:
+        # eski qiymat shu tranzaksiya ichida o'qiladi (farq aniq bo'lsin)
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT points_x10 FROM users WHERE user_id = ?", (user_id,))
+        row = cursor.fetchone()
+        if not row:
+            return
+        cursor.execute('''
+            UPDATE users
+            SET points_x10 = ?
+            WHERE user_id = ?
+        ''', (value_x10, user_id))
+
+    record_points_event(user_id, value_x10 - int(row[0] or 0), source)
+    notify_points_changed([user_id])
 
 
 def increment_referrals(user_id: int):
-    conn = create_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE users
-        SET referrals_count = COALESCE(referrals_count, 0) + 1
-        WHERE user_id = ?
-    ''', (user_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection()
+    with conn:
+        conn.execute('''
+            UPDATE users
+            SET referrals_count = COALESCE(referrals_count, 0) + 1
+            WHERE user_id = ?
+        ''', (user_id,))
+    notify_points_changed([user_id])
 
 
 def get_referrals_count(user_id: int) -> int:
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute("SELECT COALESCE(referrals_count, 0) FROM users WHERE user_id = ?", (user_id,))
     row = cursor.fetchone()
-    conn.close()
     return row[0] if row else 0
 
 
@@ -550,38 +678,142 @@ def add_referral(referrer_id: int, referred_id: int, bonus_points: int = 200) ->
     if referrer_id == referred_id:
         return False
 
-    conn = create_connection()
+    bonus_x10 = points_to_x10(bonus_points)
+
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute('''
-            INSERT INTO referrals (referrer_id, referred_id)
-            VALUES (?, ?)
-        ''', (referrer_id, referred_id))
+        with conn:
+            _insert_referral(cursor, referrer_id, referred_id, bonus_x10)
+    except sqlite3.IntegrityError:
+        return False
 
-        # ✅ points ROUND bilan
+    record_points_event(referrer_id, bonus_x10, SOURCE_REFERRAL)
+    notify_points_changed([referrer_id])
+    return True
 
-        # referrer users jadvalida bo'lmasa, row yaratib qo'yamiz (points yo'qolmasin)
-        cursor.execute('INSERT OR IGNORE INTO users (user_id) VALUES (?)', (referrer_id,))
 
-        # ✅ points ROUND bilan
-        cursor.execute('''
-            UPDATE users
-            SET
-                points = ROUND(COALESCE(points, 0) + ?, 1),
-                referrals_count = COALESCE(referrals_count, 0) + 1
-            WHERE user_id = ?
-        ''', (float(bonus_points), referrer_id))
+def _insert_referral(cursor, referrer_id: int, referred_id: int, bonus_x10: int):
+    """Chaqiruvchi tranzaksiyasi ichida; referred_id band bo'lsa IntegrityError."""
+    now = int(time.time())
+    cursor.execute('''
+        INSERT INTO referrals (referrer_id, referred_id, created_ts)
+        VALUES (?, ?, ?)
+    ''', (referrer_id, referred_id, now))
 
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
+    # referrer users jadvalida bo'lmasa, row yaratib qo'yamiz (points yo'qolmasin)
+    cursor.execute(
+        'INSERT OR IGNORE INTO users (user_id, joined_ts) VALUES (?, ?)', (referrer_id, now)
+    )
+
+    cursor.execute('''
+        UPDATE users
+        SET
+            points_x10 = points_x10 + ?,
+            referrals_count = COALESCE(referrals_count, 0) + 1
+        WHERE user_id = ?
+    ''', (bonus_x10, referrer_id))
+
+
+# ----------- PENDING REFERRAL (obuna kutilayotgan takliflar) -----------
+
+def set_pending_referral(referrer_id: int, referred_id: int) -> bool:
+    """
+    /start arg orqali kelgan referral'ni pending qilib qo'yadi.
+    return True = yozildi, False = yozilmadi (bor yoki self-ref)
+    """
+    if not referrer_id or not referred_id:
         return False
+    if referrer_id == referred_id:
+        return False
+
+    conn = get_connection()
+    with conn:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO pending_referrals (referred_id, referrer_id) VALUES (?, ?)",
+            (referred_id, referrer_id)
+        )
+    return cur.rowcount > 0
+
+
+def get_pending_referrer(referred_id: int):
+    row = get_connection().execute(
+        "SELECT referrer_id FROM pending_referrals WHERE referred_id = ? LIMIT 1",
+        (referred_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_pending_referrals_batch(after_referred_id: int = 0, limit: int = 200):
+    """Pendinglar PK bo'yicha partiyalab (keyset): [(referred_id, referrer_id), ...]"""
+    return get_connection().execute('''
+        SELECT referred_id, referrer_id FROM pending_referrals
+        WHERE referred_id > ?
+        ORDER BY referred_id
+        LIMIT ?
+    ''', (after_referred_id, limit)).fetchall()
+
+
+def expire_pending_referrals(max_age_days: int) -> int:
+    """max_age_days dan eski pendinglarni o'chiradi. return: o'chirilganlar soni."""
+    conn = get_connection()
+    with conn:
+        cur = conn.execute(
+            "DELETE FROM pending_referrals WHERE created_at < datetime('now', ?)",
+            (f"-{int(max_age_days)} days",)
+        )
+    return cur.rowcount
+
+
+def activate_pending_referral(referred_id: int, bonus_points: int = 200):
+    """
+    Bitta IMMEDIATE tranzaksiya: pendingni o'qish -> bonus (add_referral kabi) -> pendingni
+    o'chirish. Bonus berilmasa ham (allaqachon olingan) pending o'chiriladi.
+    Ikki parallel bosish bir xil pendingni ikki marta ishlata olmaydi.
+    return: referrer_id (bonus berildi) yoki None
+    """
+    bonus_x10 = points_to_x10(bonus_points)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(
+            "SELECT referrer_id FROM pending_referrals WHERE referred_id = ?", (referred_id,)
+        )
+        row = cursor.fetchone()
+        referrer_id = row[0] if row else None
+
+        credited = False
+        if referrer_id and referrer_id != referred_id:
+            cursor.execute("SAVEPOINT referral")
+            try:
+                _insert_referral(cursor, referrer_id, referred_id, bonus_x10)
+                credited = True
+            except sqlite3.IntegrityError:
+                # referred_id allaqachon referrals da - bonus qayta berilmaydi
+                cursor.execute("ROLLBACK TO referral")
+            cursor.execute("RELEASE referral")
+
+        if row:
+            cursor.execute("DELETE FROM pending_referrals WHERE referred_id = ?", (referred_id,))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        print(f"Pending referralni faollashtirishda xatolik: {e}")
+        return None
     finally:
-        conn.close()
+        cursor.close()
+
+    if not credited:
+        return None
+    record_points_event(referrer_id, bonus_x10, SOURCE_REFERRAL)
+    notify_points_changed([referrer_id])
+    return referrer_id
 
 
 def get_referrals_for_user(referrer_id: int):
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT u.user_id, u.username, u.full_name, r.created_at
@@ -590,77 +822,192 @@ def get_referrals_for_user(referrer_id: int):
         WHERE r.referrer_id = ?
         ORDER BY r.created_at DESC
     ''', (referrer_id,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return cursor.fetchall()
+
+
+REFERRALS_PAGE_SIZE = 10
+
+
+def get_referrals_page(referrer_id: int, cursor=None, direction: str = "next",
+                       limit: int = REFERRALS_PAGE_SIZE):
+    """
+    Takliflar ro'yxatining bitta sahifasi (yangilari birinchi), keyset bo'yicha.
+    cursor: (created_at, id) - joriy sahifaning chegarasi; None -> birinchi sahifa.
+    direction: "next" - cursor dan eskilari, "prev" - cursor dan yangilari.
+    idx_referrals_referrer_created (referrer_id, created_at, +rowid=id) bo'yicha
+    faqat limit+1 qator o'qiladi, OFFSET yo'q.
+
+    return: (rows, has_newer, has_older)
+        rows: [(user_id, username, full_name, created_at, referral_id), ...]
+    """
+    params = [referrer_id]
+    where = "r.referrer_id = ?"
+    order = "DESC"
+    if cursor is not None:
+        if direction == "prev":
+            where += " AND (r.created_at, r.id) > (?, ?)"
+            order = "ASC"
+        else:
+            where += " AND (r.created_at, r.id) < (?, ?)"
+        params.extend(cursor)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(f'''
+        SELECT u.user_id, u.username, u.full_name, r.created_at, r.id
+        FROM referrals r
+        JOIN users u ON u.user_id = r.referred_id
+        WHERE {where}
+        ORDER BY r.created_at {order}, r.id {order}
+        LIMIT ?
+    ''', (*params, limit + 1))
+    rows = cur.fetchall()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if order == "ASC":
+        rows.reverse()
+        # yangi tomonga yurdik: eskilari (biz kelgan sahifa) albatta bor
+        return rows, has_more, True
+    return rows, cursor is not None, has_more
 
 
 def get_top_users(limit: int = 10):
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT user_id, username, full_name,
-               ROUND(COALESCE(points, 0), 1) AS pts,
+               points_x10 / 10.0 AS pts,
                COALESCE(referrals_count, 0) AS refs
         FROM users
-        ORDER BY pts DESC, refs DESC, joined_at ASC
+        ORDER BY points_x10 DESC, COALESCE(referrals_count, 0) DESC, COALESCE(joined_at, '') ASC, user_id ASC
         LIMIT ?
     ''', (limit,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return cursor.fetchall()
+
+
+def get_users_total() -> int:
+    """Jami foydalanuvchilar (stats_rollup, triggerlar yuritadi)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT value FROM stats_rollup WHERE key = 'users_total'")
+    row = cursor.fetchone()
+    return row[0] if row else 0
 
 
-def get_all_users_with_stats():
-    conn = create_connection()
+def get_user_rank(user_id: int):
+    """
+    Userning reytingdagi o'rni (get_top_users bilan bir xil tartib).
+    Yuqorida turganlar idx_users_points_x10 bo'yicha sanaladi, 1000 ta qator
+    tortib chiqilmaydi.
+    return: (rank | None, total_users) - user bazada bo'lmasa rank None
+    """
+    conn = get_connection()
     cursor = conn.cursor()
+    total_users = get_users_total()
+
+    # NULL lar tartibdagidek: referrals_count -> 0, joined_at -> '' (eng birinchi);
+    # leaderboard._make_key bilan bir xil
+    cursor.execute(
+        "SELECT points_x10, COALESCE(referrals_count, 0), COALESCE(joined_at, '') "
+        "FROM users WHERE user_id = ?",
+        (user_id,)
+    )
+    row = cursor.fetchone()
+    if not row:
+        return None, total_users
+
+    points_x10, refs, joined_at = row
+    # har bir qism indeksning bitta oralig'i (OR o'rniga - indeks ishlatilsin)
     cursor.execute('''
-        SELECT user_id, username, full_name, joined_at,
-               ROUND(COALESCE(points, 0), 1) AS pts,
-               COALESCE(referrals_count, 0) AS refs
-        FROM users
-        ORDER BY pts DESC, joined_at ASC
-    ''')
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+        SELECT
+            (SELECT COUNT(*) FROM users WHERE points_x10 > :p)
+          + (SELECT COUNT(*) FROM users
+             WHERE points_x10 = :p AND COALESCE(referrals_count, 0) > :r)
+          + (SELECT COUNT(*) FROM users
+             WHERE points_x10 = :p AND COALESCE(referrals_count, 0) = :r
+               AND COALESCE(joined_at, '') < :j)
+          + (SELECT COUNT(*) FROM users
+             WHERE points_x10 = :p AND COALESCE(referrals_count, 0) = :r
+               AND COALESCE(joined_at, '') = :j AND user_id < :u)
+    ''', {"p": points_x10, "r": refs, "j": joined_at, "u": user_id})
+    above = cursor.fetchone()[0] or 0
+    return above + 1, total_users
+
+
+def iter_users_with_stats(batch_size: int = 1000):
+    """
+    Barcha userlar reyting tartibida (botni bloklaganlar ham - eksport to'liq),
+    ro'yxat yig'ilmaydi: kursor batch_size tadan (fetchmany) o'qiladi. Generator - eksport uchun.
+    """
+    cursor = get_connection().cursor()
+    try:
+        cursor.execute('''
+            SELECT user_id, username, full_name, joined_at,
+                   points_x10 / 10.0 AS pts,
+                   COALESCE(referrals_count, 0) AS refs
+            FROM users
+            ORDER BY points_x10 DESC, COALESCE(referrals_count, 0) DESC, COALESCE(joined_at, '') ASC, user_id ASC
+        ''')
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
 
 
 # ----------- GIFT LIKE OPERATSIYALARI -----------
 
+# Jami likelar: stats_rollup.gift_likes_total (trigger yuritadi) + xotiradagi nusxa.
+# None -> hali o'qilmagan (yoki restore'dan keyin qayta o'qilsin).
+_gift_likes_total = None
+
+
 def add_gift_like(user_id: int):
-    conn = create_connection()
+    """
+    Bitta tranzaksiya: INSERT OR IGNORE (qayta bosish e'tiborsiz) + hisoblagichni o'qish.
+    return: (yangi_like_mi, jami_likelar)
+    """
+    global _gift_likes_total
+
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT 1 FROM gift_likes WHERE user_id = ?", (user_id,))
-        already = cursor.fetchone() is not None
-
-        if not already:
-            cursor.execute("INSERT INTO gift_likes (user_id) VALUES (?)", (user_id,))
-            conn.commit()
-
-        cursor.execute("SELECT COUNT(*) FROM gift_likes")
-        total = cursor.fetchone()[0]
-        return (not already), total
+        with conn:
+            cursor.execute("INSERT OR IGNORE INTO gift_likes (user_id) VALUES (?)", (user_id,))
+            is_new = cursor.rowcount > 0
+            cursor.execute("SELECT value FROM stats_rollup WHERE key = 'gift_likes_total'")
+            row = cursor.fetchone()
+            total = row[0] if row else 0
+
+        _gift_likes_total = total
+        return is_new, total
     except sqlite3.Error as e:
         print(f"gift_likes xatosi: {e}")
         return False, 0
-    finally:
-        conn.close()
 
 
 def get_gift_likes_count() -> int:
-    conn = create_connection()
+    global _gift_likes_total
+
+    total = _gift_likes_total
+    if total is not None:
+        return total
+
+    conn = get_connection()
     cursor = conn.cursor()
     try:
-        cursor.execute("SELECT COUNT(*) FROM gift_likes")
+        cursor.execute("SELECT value FROM stats_rollup WHERE key = 'gift_likes_total'")
         row = cursor.fetchone()
-        return row[0] if row else 0
+        total = row[0] if row else 0
     except sqlite3.Error as e:
         print(f"gift_likes count xatosi: {e}")
         return 0
-    finally:
-        conn.close()
+
+    _gift_likes_total = total
+    return total
 
 
 def get_user_by_username(username: str):
@@ -669,22 +1016,20 @@ def get_user_by_username(username: str):
 
     username = username.lstrip("@")
 
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
     cursor.execute('''
         SELECT user_id,
                username,
                full_name,
                joined_at,
-               ROUND(COALESCE(points, 0), 1) AS pts,
+               points_x10 / 10.0 AS pts,
                COALESCE(referrals_count, 0) AS refs
         FROM users
-        WHERE LOWER(username) = LOWER(?)
+        WHERE username = ? COLLATE NOCASE
         LIMIT 1
     ''', (username,))
-    row = cursor.fetchone()
-    conn.close()
-    return row
+    return cursor.fetchone()
 
 
 # ===================== BONUS (6 soat) =====================
@@ -701,11 +1046,20 @@ def _format_hms(seconds: int) -> str:
     return f"{h:02d}:{m:02d}:{s:02d}"
 
 
+def get_last_bonus_claim_ts(user_id: int):
+    """bonus_claims dan oxirgi claim vaqti (yo'q bo'lsa None)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT last_claim_ts FROM bonus_claims WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
 def claim_bonus_atomic(user_id: int, amount: int, cooldown_seconds: int = BONUS_COOLDOWN_SECONDS):
     """
     Atomik bonus claim:
     - cooldown tekshiradi
-    - ruxsat bo'lsa: amount ni users.points ga qo'shadi (ROUND 1),
+    - ruxsat bo'lsa: amount ni users.points_x10 ga qo'shadi,
       last_claim_ts ni yangilaydi
     """
     now = int(time.time())
@@ -717,13 +1071,13 @@ def claim_bonus_atomic(user_id: int, amount: int, cooldown_seconds: int = BONUS_
     if amount < 0:
         amount = 0.0
 
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
 
     try:
         cursor.execute("BEGIN IMMEDIATE")
 
-        cursor.execute("INSERT OR IGNORE INTO users (user_id) VALUES (?)", (user_id,))
+        cursor.execute("INSERT OR IGNORE INTO users (user_id, joined_ts) VALUES (?, ?)", (user_id, now))
 
         cursor.execute("SELECT last_claim_ts FROM bonus_claims WHERE user_id = ?", (user_id,))
         row = cursor.fetchone()
@@ -736,12 +1090,12 @@ def claim_bonus_atomic(user_id: int, amount: int, cooldown_seconds: int = BONUS_
                 conn.commit()
                 return False, 0, wait, _format_hms(wait)
 
-        # ✅ points ROUND bilan
+        amount_x10 = points_to_x10(amount)
         cursor.execute("""
             UPDATE users
-            SET points = ROUND(COALESCE(points, 0) + ?, 1)
+            SET points_x10 = points_x10 + ?
             WHERE user_id = ?
-        """, (amount, user_id))
+        """, (amount_x10, user_id))
 
         cursor.execute("""
             INSERT INTO bonus_claims (user_id, last_claim_ts)
@@ -751,6 +1105,8 @@ def claim_bonus_atomic(user_id: int, amount: int, cooldown_seconds: int = BONUS_
         """, (user_id, now))
 
         conn.commit()
+        record_points_event(user_id, amount_x10, SOURCE_BONUS, ts=now)
+        notify_points_changed([user_id])
         return True, amount, 0, "00:00:00"
 
     except sqlite3.Error as e:
@@ -761,9 +1117,6 @@ def claim_bonus_atomic(user_id: int, amount: int, cooldown_seconds: int = BONUS_
         print(f"claim_bonus_atomic xatosi: {e}")
         return False, 0, 60, _format_hms(60)
 
-    finally:
-        conn.close()
-
 
 if __name__ == "__main__":
     init_database()
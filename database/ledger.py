@@ -0,0 +1,199 @@
+"""
+Ballar jurnali (points_events) va kunlik jamlanma (points_daily).
+
+Har bir ball o'zgarishi (quiz, tezkor so'zlar, bonus, referral, admin) shu yerga
+yoziladi. Yozish hot-path'da bo'lmaydi: record_points_event() faqat navbatga
+qo'yadi, fon thread esa yig'ilgan hodisalarni bitta tranzaksiyada (group commit)
+points_events ga qo'shadi va points_daily ni yangilaydi.
+
+points_daily tufayli "bugun / shu hafta qancha ball" savoli xom qatorlarni
+SUM qilmasdan, bitta-ikkita PRIMARY KEY o'qishi bilan javob topadi.
+"""
+
+import atexit
+import datetime
+import queue
+import threading
+import time
+
+from database.write_retry import WriteRetry
+
+# Fon yozuvchi sozlamalari
+LEDGER_FLUSH_INTERVAL = 0.5   # sekund: navbat shuncha vaqtda bir bo'shatiladi
+LEDGER_BATCH_MAX = 500        # bitta tranzaksiyadagi maksimal hodisalar
+
+# Manbalar (source ustuni)
+SOURCE_QUIZ = "quiz"
+SOURCE_FASTWORDS = "fastwords"
+SOURCE_BONUS = "bonus"
+SOURCE_REFERRAL = "referral"
+SOURCE_ADMIN = "admin"
+SOURCE_MANUAL = "manual"
+
+_queue = queue.Queue()
+_writer_thread = None
+_writer_lock = threading.Lock()
+# Bitta batch bir vaqtda faqat bitta joyda yoziladi (writer thread yoki flush_ledger)
+_flush_lock = threading.Lock()
+_retry = WriteRetry("ledger")
+
+# Metrikalar (_flush_lock ostida yangilanadi)
+_metrics = {
+    "events_written": 0,
+    "batches": 0,
+    "last_batch_size": 0,
+    "last_flush_ms": 0.0,
+    "errors": 0,
+}
+
+
+def day_key(ts: int) -> str:
+    """Epoch -> mahalliy sana 'YYYY-MM-DD' (points_daily kaliti)."""
+    return time.strftime("%Y-%m-%d", time.localtime(ts))
+
+
+def record_points_event(user_id: int, delta_x10: int, source: str, ts: int | None = None):
+    """
+    Ball o'zgarishini jurnalga navbatga qo'yadi (DBga darhol yozmaydi).
+    Chaqiruvchi tranzaksiya commit bo'lgandan keyin chaqirilsin.
+    """
+    if not delta_x10:
+        return
+    if ts is None:
+        ts = int(time.time())
+    _ensure_writer()
+    _queue.put((int(user_id), int(delta_x10), source or SOURCE_MANUAL, int(ts)))
+
+
+def _write_batch(events: list):
+    """Bitta tranzaksiya: xom hodisalar + kunlik jamlanma."""
+    from database.database import get_connection
+
+    daily = {}
+    for _, delta_x10, _, ts in events:
+        key = day_key(ts)
+        total, count = daily.get(key, (0, 0))
+        daily[key] = (total + delta_x10, count + 1)
+
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "INSERT INTO points_events (user_id, delta_x10, source, created_ts) VALUES (?, ?, ?, ?)",
+            events
+        )
+        conn.executemany('''
+            INSERT INTO points_daily (day, delta_x10, events)
+            VALUES (?, ?, ?)
+            ON CONFLICT(day) DO UPDATE SET
+                delta_x10 = delta_x10 + excluded.delta_x10,
+                events = events + excluded.events
+        ''', [(day, total, count) for day, (total, count) in daily.items()])
+
+
+def _drain(block_first: bool) -> list:
+    events = []
+    try:
+        if block_first:
+            events.append(_queue.get(timeout=LEDGER_FLUSH_INTERVAL))
+        while len(events) < LEDGER_BATCH_MAX:
+            events.append(_queue.get_nowait())
+    except queue.Empty:
+        pass
+    return events
+
+
+def _flush_once(block_first: bool) -> int:
+    events = _drain(block_first)
+    if not events:
+        return 0
+
+    with _flush_lock:
+        _write_with_metrics(events)
+    return len(events)
+
+
+def _requeue(events: list):
+    for ev in events:
+        _queue.put(ev)
+
+
+def _write_with_metrics(events: list) -> bool:
+    started = time.perf_counter()
+    try:
+        _write_batch(events)
+    except Exception as e:
+        _metrics["errors"] += 1
+        print(f"[ledger] yozishda xatolik ({len(events)} ta hodisa): {e}")
+        _retry.failed(events, key=lambda ev: ev, requeue=_requeue, error=e)
+        return False
+
+    _retry.succeeded(events)
+    _metrics["events_written"] += len(events)
+    _metrics["batches"] += 1
+    _metrics["last_batch_size"] = len(events)
+    _metrics["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return True
+
+
+def _writer_loop():
+    while True:
+        _flush_once(block_first=True)
+        # navbat to'la bo'lsa kutmasdan davom etamiz, aks holda biroz yig'ilsin
+        if _queue.qsize() < LEDGER_BATCH_MAX:
+            time.sleep(LEDGER_FLUSH_INTERVAL)
+
+
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            t = threading.Thread(target=_writer_loop, name="points-ledger", daemon=True)
+            t.start()
+            _writer_thread = t
+
+
+def flush_ledger():
+    """Navbatdagi barcha hodisalarni joriy threadda yozib tugatadi (shutdown uchun)."""
+    with _flush_lock:
+        while True:
+            events = _drain(block_first=False)
+            if not events or not _write_with_metrics(events):
+                break
+
+
+atexit.register(flush_ledger)
+
+
+def get_ledger_metrics() -> dict:
+    m = dict(_metrics)
+    m["queued"] = _queue.qsize()
+    m["dropped"] = _retry.dropped
+    return m
+
+
+# ===================== O'QISH =====================
+
+def get_points_for_day(day: str | None = None) -> float:
+    """Berilgan kun (default: bugun) bo'yicha sof ball o'zgarishi."""
+    from database.database import get_connection, points_from_x10
+
+    if day is None:
+        day = day_key(int(time.time()))
+    row = get_connection().execute(
+        "SELECT delta_x10 FROM points_daily WHERE day = ?", (day,)
+    ).fetchone()
+    return points_from_x10(row[0] if row else 0)
+
+
+def get_points_for_last_days(days: int = 7) -> float:
+    """Oxirgi N kun (bugun ham kiradi) bo'yicha sof ball o'zgarishi."""
+    from database.database import get_connection, points_from_x10
+
+    today = datetime.date.today()
+    start = (today - datetime.timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    row = get_connection().execute(
+        "SELECT COALESCE(SUM(delta_x10), 0) FROM points_daily WHERE day >= ?", (start,)
+    ).fetchone()
+    return points_from_x10(row[0] if row else 0)
@@ -0,0 +1,669 @@
+"""
+Versiyalangan sxema migratsiyalari.
+
+Har bir migratsiya MIGRATIONS ro'yxatiga (version, nomi, funksiya) ko'rinishida
+qo'shiladi va faqat bir marta, o'z tranzaksiyasi ichida bajariladi.
+Bajarilganlari schema_version jadvalida yoziladi.
+
+Qoidalar:
+- versiyalar faqat o'sib boradi, eski migratsiyani o'zgartirmang - yangisini qo'shing;
+- har bir qadam idempotent bo'lsin (IF NOT EXISTS, ustun bor-yo'qligini tekshirish),
+  chunki eski bazalarda jadval/ustun allaqachon bo'lishi mumkin.
+"""
+
+import sqlite3
+
+from database.rollup import compute_rollup, compute_rollup_daily, write_rollup
+
+
+def _column_exists(cursor, table: str, column: str) -> bool:
+    cursor.execute(f"PRAGMA table_info({table})")
+    return any(row[1] == column for row in cursor.fetchall())
+
+
+def _add_column_if_missing(cursor, table: str, column: str, ddl: str):
+    if not _column_exists(cursor, table, column):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+# ===================== MIGRATSIYALAR =====================
+
+def _m001_base_schema(cursor):
+    """Boshlang'ich jadvallar (avval init_database har safar yaratardi)."""
+
+    # Kurslar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS courses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    # ✅ BONUS CLAIMS
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS bonus_claims (
+            user_id INTEGER PRIMARY KEY,
+            last_claim_ts INTEGER NOT NULL
+        )
+    ''')
+
+    # Kurs ma'lumotlari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS course_details (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER NOT NULL,
+            price TEXT,
+            schedule TEXT,
+            description TEXT,
+            image_path TEXT,
+            FOREIGN KEY (course_id) REFERENCES courses (id)
+        )
+    ''')
+
+    # O'qituvchilar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS teachers (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            course_id INTEGER NOT NULL,
+            full_name TEXT NOT NULL,
+            achievements TEXT,
+            image_path TEXT,
+            FOREIGN KEY (course_id) REFERENCES courses (id)
+        )
+    ''')
+
+    # Talabalar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            full_name TEXT NOT NULL,
+            phone_number TEXT NOT NULL,
+            username TEXT,
+            course_id INTEGER,
+            registered_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            approved BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (course_id) REFERENCES courses (id)
+        )
+    ''')
+
+    # E'lonlar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS announcements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message TEXT NOT NULL,
+            image_path TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 🎬 Kurs videosi ko‘rganlar
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS course_video_views (
+            user_id INTEGER PRIMARY KEY,
+            viewed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Admin guruhlari jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admin_groups (
+            group_id INTEGER PRIMARY KEY,
+            group_title TEXT NOT NULL,
+            added_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Foydalanuvchilar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT,
+            full_name TEXT,
+            points REAL DEFAULT 0,
+            referrals_count INTEGER DEFAULT 0,
+            joined_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 🔥 Eski bazalar uchun ustunlar: points, referrals_count
+    # IMPORTANT: points REAL bo'lsin (0.2 / 0.5 uchun)
+    _add_column_if_missing(cursor, "users", "points", "REAL DEFAULT 0.0")
+    _add_column_if_missing(cursor, "users", "referrals_count", "INTEGER DEFAULT 0")
+
+    # 🔥 Takliflar jadvali
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS referrals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            referrer_id INTEGER NOT NULL,
+            referred_id INTEGER NOT NULL UNIQUE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (referrer_id) REFERENCES users (user_id),
+            FOREIGN KEY (referred_id) REFERENCES users (user_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gift_likes (
+            user_id INTEGER PRIMARY KEY,
+            liked_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m002_hot_path_indexes(cursor):
+    """Tez-tez ishlaydigan so'rovlar uchun indekslar."""
+
+    # NULL'lar indeks tartibini buzmasin (so'rovlar endi COALESCE'siz saralaydi)
+    cursor.execute("UPDATE users SET points = 0 WHERE points IS NULL")
+    cursor.execute("UPDATE users SET referrals_count = 0 WHERE referrals_count IS NULL")
+
+    # get_top_users / iter_users_with_stats: ORDER BY points, referrals, joined_at
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_leaderboard
+        ON users (points DESC, referrals_count DESC, joined_at ASC)
+    ''')
+
+    # "oxirgi 24 soat / 7 kun" yangi userlar
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_users_joined_at ON users (joined_at)")
+
+    # get_user_by_username / find_user_by_username: katta-kichik harfsiz qidiruv
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_username_nocase
+        ON users (username COLLATE NOCASE)
+    ''')
+
+    # get_referrals_for_user: WHERE referrer_id = ? ORDER BY created_at DESC
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_referrals_referrer_created
+        ON referrals (referrer_id, created_at)
+    ''')
+
+    # approve_student / delete_student: full_name + phone_number + course_id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_lookup
+        ON students (phone_number, course_id, full_name)
+    ''')
+
+    # delete_course / kurs bo'yicha tasdiqlangan talabalar
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_students_course_approved
+        ON students (course_id, approved)
+    ''')
+
+    # get_announcements: ORDER BY created_at DESC LIMIT 5
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_announcements_created
+        ON announcements (created_at)
+    ''')
+
+
+def _m003_points_x10(cursor):
+    """
+    users.points REAL -> users.points_x10 INTEGER (ballning o'ndan bir ulushlari).
+    Butun sonlarda qo'shish aniq, ROUND kerak emas, saralash/oraliq so'rovlari indeksdan.
+    """
+    _add_column_if_missing(cursor, "users", "points_x10", "INTEGER NOT NULL DEFAULT 0")
+
+    if _column_exists(cursor, "users", "points"):
+        # Mavjud qatorlarni joyida konvertatsiya qilamiz (jadval qayta qurilmaydi)
+        cursor.execute('''
+            UPDATE users
+            SET points_x10 = CAST(ROUND(COALESCE(points, 0) * 10) AS INTEGER)
+        ''')
+
+    cursor.execute("DROP INDEX IF EXISTS idx_users_leaderboard")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_points_x10
+        ON users (points_x10 DESC, referrals_count DESC, joined_at ASC)
+    ''')
+
+    # Eski REAL ustun endi hech qayerda o'qilmaydi.
+    # DROP COLUMN SQLite 3.35+ da bor; eskiroq versiyada ustun shunchaki qoladi.
+    if _column_exists(cursor, "users", "points"):
+        try:
+            cursor.execute("ALTER TABLE users DROP COLUMN points")
+        except sqlite3.OperationalError as e:
+            print(f"users.points ustunini o'chirib bo'lmadi (e'tiborsiz qoldiriladi): {e}")
+
+
+def _m004_points_ledger(cursor):
+    """Ball o'zgarishlari jurnali va kunlik jamlanma (database/ledger.py)."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS points_events (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            delta_x10 INTEGER NOT NULL,
+            source TEXT NOT NULL,
+            created_ts INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_points_events_user_ts
+        ON points_events (user_id, created_ts)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_points_events_ts
+        ON points_events (created_ts)
+    ''')
+
+    # 'YYYY-MM-DD' -> shu kundagi sof o'zgarish (x10) va hodisalar soni
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS points_daily (
+            day TEXT PRIMARY KEY,
+            delta_x10 INTEGER NOT NULL DEFAULT 0,
+            events INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+
+
+def _m005_users_total_counter(cursor):
+    """
+    Umumiy hisoblagichlar (stats_rollup) va users_total ni triggerlar bilan yuritish:
+    "jami foydalanuvchilar" uchun har safar COUNT(*) qilinmaydi.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_rollup (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO stats_rollup (key, value)
+        SELECT 'users_total', COUNT(*) FROM users
+    ''')
+
+    # INSERT OR IGNORE e'tiborsiz qolsa trigger ishlamaydi - hisob to'g'ri qoladi
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_total_insert
+        AFTER INSERT ON users
+        BEGIN
+            UPDATE stats_rollup SET value = value + 1 WHERE key = 'users_total';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_users_total_delete
+        AFTER DELETE ON users
+        BEGIN
+            UPDATE stats_rollup SET value = value - 1 WHERE key = 'users_total';
+        END
+    ''')
+
+
+def _m006_gift_likes_counter(cursor):
+    """Sovg'a likelari soni stats_rollup da (har safar COUNT(*) qilinmaydi)."""
+    cursor.execute('''
+        INSERT OR REPLACE INTO stats_rollup (key, value)
+        SELECT 'gift_likes_total', COUNT(*) FROM gift_likes
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_gift_likes_total_insert
+        AFTER INSERT ON gift_likes
+        BEGIN
+            UPDATE stats_rollup SET value = value + 1 WHERE key = 'gift_likes_total';
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS trg_gift_likes_total_delete
+        AFTER DELETE ON gift_likes
+        BEGIN
+            UPDATE stats_rollup SET value = value - 1 WHERE key = 'gift_likes_total';
+        END
+    ''')
+
+
+# users.points_x10 ning hisoblagichlarga hissasi (v7 triggerlari uchun)
+_USERS_POINTS_DELTA = '''
+    UPDATE stats_rollup SET value = value + CASE key
+        WHEN 'users_points_x10' THEN {sign}({row}.points_x10)
+        WHEN 'users_positive_x10' THEN {sign}(MAX({row}.points_x10, 0))
+        WHEN 'users_negative_x10' THEN {sign}(MAX(-{row}.points_x10, 0))
+        WHEN 'users_negative' THEN {sign}({row}.points_x10 < 0)
+        WHEN 'users_zero' THEN {sign}({row}.points_x10 = 0)
+    END
+    WHERE key IN ('users_points_x10', 'users_positive_x10', 'users_negative_x10',
+                  'users_negative', 'users_zero');
+'''
+
+_DAILY_DELTA = '''
+    INSERT INTO stats_rollup_daily (day, key, value)
+    VALUES (DATE({col}, 'localtime'), '{key}', {delta})
+    ON CONFLICT(day, key) DO UPDATE SET value = value + ({delta});
+'''
+
+
+def _counter_delta(key: str, delta: str) -> str:
+    return f"UPDATE stats_rollup SET value = value + ({delta}) WHERE key = '{key}';"
+
+
+def _m007_stats_rollup(cursor):
+    """
+    /stats uchun to'liq hisoblagichlar: users (ball yig'indilari, manfiy/0),
+    referrals, courses, students, announcements + kunlik yangi userlar/takliflar.
+    Hammasini triggerlar yuritadi; tekshiruv: database/rollup.verify_rollup.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS stats_rollup_daily (
+            day TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, key)
+        )
+    ''')
+
+    triggers = {
+        # users: ball hissasi (users_total v5 da)
+        "trg_rollup_users_insert": (
+            "AFTER INSERT ON users",
+            _USERS_POINTS_DELTA.format(sign="+", row="new")
+            + _DAILY_DELTA.format(col="new.joined_at", key="new_users", delta="1"),
+        ),
+        "trg_rollup_users_delete": (
+            "AFTER DELETE ON users",
+            _USERS_POINTS_DELTA.format(sign="-", row="old")
+            + _DAILY_DELTA.format(col="old.joined_at", key="new_users", delta="-1"),
+        ),
+        "trg_rollup_users_points": (
+            "AFTER UPDATE OF points_x10 ON users WHEN old.points_x10 IS NOT new.points_x10",
+            _USERS_POINTS_DELTA.format(sign="-", row="old")
+            + _USERS_POINTS_DELTA.format(sign="+", row="new"),
+        ),
+        "trg_rollup_referrals_insert": (
+            "AFTER INSERT ON referrals",
+            _counter_delta("referrals_total", "1")
+            + _DAILY_DELTA.format(col="new.created_at", key="referrals", delta="1"),
+        ),
+        "trg_rollup_referrals_delete": (
+            "AFTER DELETE ON referrals",
+            _counter_delta("referrals_total", "-1")
+            + _DAILY_DELTA.format(col="old.created_at", key="referrals", delta="-1"),
+        ),
+        "trg_rollup_courses_insert": ("AFTER INSERT ON courses", _counter_delta("courses_total", "1")),
+        "trg_rollup_courses_delete": ("AFTER DELETE ON courses", _counter_delta("courses_total", "-1")),
+        "trg_rollup_students_insert": (
+            "AFTER INSERT ON students",
+            _counter_delta("students_total", "1")
+            + _counter_delta("students_approved", "new.approved = 1"),
+        ),
+        "trg_rollup_students_delete": (
+            "AFTER DELETE ON students",
+            _counter_delta("students_total", "-1")
+            + _counter_delta("students_approved", "-(old.approved = 1)"),
+        ),
+        "trg_rollup_students_approved": (
+            "AFTER UPDATE OF approved ON students",
+            _counter_delta("students_approved", "(new.approved = 1) - (old.approved = 1)"),
+        ),
+        "trg_rollup_announcements_insert": (
+            "AFTER INSERT ON announcements", _counter_delta("announcements_total", "1")
+        ),
+        "trg_rollup_announcements_delete": (
+            "AFTER DELETE ON announcements", _counter_delta("announcements_total", "-1")
+        ),
+    }
+    for name, (event, body) in triggers.items():
+        cursor.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END")
+
+    # boshlang'ich qiymatlar (v5/v6 dagi kalitlar ham qayta hisoblanadi)
+    write_rollup(cursor, compute_rollup(cursor), compute_rollup_daily(cursor))
+
+
+def _m008_epoch_timestamps(cursor):
+    """
+    DATETIME (TEXT) ustunlar yoniga butun sonli epoch ustunlar:
+    users.joined_ts, referrals.created_ts, students.registered_ts.
+    Vaqt oralig'i so'rovlari (24 soat / 7 kun / bugun) indeks bo'yicha ishlaydi.
+    """
+    for table, text_col, ts_col in (
+        ("users", "joined_at", "joined_ts"),
+        ("referrals", "created_at", "created_ts"),
+        ("students", "registered_at", "registered_ts"),
+    ):
+        _add_column_if_missing(cursor, table, ts_col, "INTEGER")
+        # CURRENT_TIMESTAMP UTC da yozilgan -> strftime('%s') to'g'ri epoch beradi
+        cursor.execute(f'''
+            UPDATE {table}
+            SET {ts_col} = CAST(strftime('%s', {text_col}) AS INTEGER)
+            WHERE {ts_col} IS NULL AND {text_col} IS NOT NULL
+        ''')
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{ts_col} ON {table} ({ts_col})")
+
+    # joined_at bo'yicha oraliq so'rovlari endi joined_ts da
+    cursor.execute("DROP INDEX IF EXISTS idx_users_joined_at")
+
+
+def _m009_last_active(cursor):
+    """users.last_active_ts - utils/activity.py guruhlab yozadi."""
+    _add_column_if_missing(cursor, "users", "last_active_ts", "INTEGER")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_last_active_ts
+        ON users (last_active_ts)
+    ''')
+
+
+def _m010_students_unique(cursor):
+    """
+    students: bitta (phone_number, course_id) - bitta yozuv (add_student upsert qiladi).
+    Eskidan qolgan takrorlar birlashtiriladi: eng oxirgi yozuv qoladi, guruhda
+    tasdiqlangani bo'lsa approved saqlanadi. Tasdiqlash/o'chirish endi id bo'yicha.
+    """
+    cursor.execute('''
+        UPDATE students
+        SET approved = 1
+        WHERE id IN (
+            SELECT MAX(id) FROM students
+            GROUP BY phone_number, course_id
+            HAVING COUNT(*) > 1 AND MAX(approved = 1) = 1
+        )
+    ''')
+    cursor.execute('''
+        DELETE FROM students
+        WHERE course_id IS NOT NULL
+          AND id NOT IN (
+            SELECT MAX(id) FROM students
+            GROUP BY phone_number, course_id
+        )
+    ''')
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_students_phone_course
+        ON students (phone_number, course_id)
+    ''')
+    # (phone_number, course_id, full_name) qidiruvi endi yo'q
+    cursor.execute("DROP INDEX IF EXISTS idx_students_lookup")
+
+
+def _m011_pending_referrals(cursor):
+    """
+    Pending referrals: bonus hali berilmagan referral'lar (obuna kutilmoqda).
+    Ilgari handlers/users/referrals.py har chaqiruvda CREATE TABLE qilardi.
+    referred_id PRIMARY KEY -> bitta user faqat 1 marta pending bo'ladi.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS pending_referrals (
+            referred_id INTEGER PRIMARY KEY,
+            referrer_id INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _m012_channel_members(cursor):
+    """
+    Kanal a'zoligi (CHANNEL_USERNAME): chat_member update'lari va bir martalik
+    solishtirish (utils/channel_members.py) yozadi. Qator yo'q -> holat noma'lum.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channel_members (
+            user_id INTEGER PRIMARY KEY,
+            is_member INTEGER NOT NULL,
+            status TEXT,
+            updated_ts INTEGER NOT NULL
+        )
+    ''')
+
+
+def _m013_broadcasts(cursor):
+    """
+    E'lon tarqatish (utils/broadcast.py): ish va har bir qabul qiluvchi holati.
+    Bot qayta ishga tushsa status='running' ishlar 'pending' yetkazishlardan davom etadi.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_chat_id INTEGER NOT NULL,
+            status_message_id INTEGER,
+            text TEXT,
+            image_path TEXT,
+            photo_file_id TEXT,
+            status TEXT NOT NULL DEFAULT 'running',
+            total INTEGER NOT NULL DEFAULT 0,
+            sent INTEGER NOT NULL DEFAULT 0,
+            blocked INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            created_ts INTEGER NOT NULL,
+            finished_ts INTEGER
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_broadcast_jobs_status
+        ON broadcast_jobs (status)
+    ''')
+
+    # status: 0 = pending, 1 = sent, 2 = blocked, 3 = failed
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS broadcast_deliveries (
+            job_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            status INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            PRIMARY KEY (job_id, user_id)
+        ) WITHOUT ROWID
+    ''')
+    # davom ettirish: WHERE job_id = ? AND status = 0 AND user_id > ? ORDER BY user_id
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_broadcast_deliveries_pending
+        ON broadcast_deliveries (job_id, status, user_id)
+    ''')
+
+
+def _m014_media_cache(cursor):
+    """
+    images/ dagi fayllar uchun Telegram file_id (utils/media_cache.py).
+    Fayl o'zgarmagan bo'lsa (size, mtime yoki sha256) qayta yuklanmaydi.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS media_cache (
+            path TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            sha256 TEXT NOT NULL,
+            file_id TEXT NOT NULL,
+            updated_ts INTEGER NOT NULL
+        )
+    ''')
+
+
+def _m015_users_reachable(cursor):
+    """
+    users.reachable / blocked_at: botni bloklagan (403) userlar belgilanadi va
+    e'lon tarqatishda o'tkazib yuboriladi. /start yoki istalgan xabar qayta yoqadi.
+    Qisman indeks faqat yetkaziladigan userlarni saqlaydi.
+    """
+    _add_column_if_missing(cursor, "users", "reachable", "INTEGER NOT NULL DEFAULT 1")
+    _add_column_if_missing(cursor, "users", "blocked_at", "INTEGER")
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_reachable
+        ON users (user_id) WHERE reachable = 1
+    ''')
+
+
+def _m016_channel_reconcile(cursor):
+    """
+    Kanal a'zoligini solishtirish holati (utils/channel_members.py): bitta qator,
+    qaysi user_id gacha o'tilgani. Ish to'xtasa keyingi ishga tushishda davom etadi.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS channel_reconcile (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_user_id INTEGER NOT NULL DEFAULT 0,
+            done INTEGER NOT NULL DEFAULT 0,
+            updated_ts INTEGER
+        )
+    ''')
+
+
+MIGRATIONS = [
+    (1, "base_schema", _m001_base_schema),
+    (2, "hot_path_indexes", _m002_hot_path_indexes),
+    (3, "points_x10", _m003_points_x10),
+    (4, "points_ledger", _m004_points_ledger),
+    (5, "users_total_counter", _m005_users_total_counter),
+    (6, "gift_likes_counter", _m006_gift_likes_counter),
+    (7, "stats_rollup", _m007_stats_rollup),
+    (8, "epoch_timestamps", _m008_epoch_timestamps),
+    (9, "last_active", _m009_last_active),
+    (10, "students_unique", _m010_students_unique),
+    (11, "pending_referrals", _m011_pending_referrals),
+    (12, "channel_members", _m012_channel_members),
+    (13, "broadcasts", _m013_broadcasts),
+    (14, "media_cache", _m014_media_cache),
+    (15, "users_reachable", _m015_users_reachable),
+    (16, "channel_reconcile", _m016_channel_reconcile),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ===================== RUNNER =====================
+
+def get_schema_version(conn) -> int:
+    """Bazadagi oxirgi qo'llangan migratsiya (schema_version yo'q bo'lsa 0)."""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] if row and row[0] is not None else 0
+
+
+def run_migrations(conn) -> int:
+    """
+    Yetishmayotgan migratsiyalarni tartib bilan qo'llaydi.
+    Sxema dolzarb bo'lsa hech qanday DDL bajarilmaydi (tez yo'l).
+    return: qo'llangan migratsiyalar soni
+    """
+    if get_schema_version(conn) >= LATEST_VERSION:
+        return 0
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    applied = 0
+    for version, name, migrate in MIGRATIONS:
+        cursor = conn.cursor()
+        try:
+            # IMMEDIATE: bir vaqtda ikki jarayon ishga tushsa ham bittasi qo'llaydi
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.execute("SELECT 1 FROM schema_version WHERE version = ?", (version,))
+            if cursor.fetchone():
+                conn.rollback()
+                continue
+
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, name) VALUES (?, ?)",
+                (version, name)
+            )
+            conn.commit()
+            applied += 1
+            print(f"🛠 Migratsiya qo'llandi: v{version} {name}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    return applied
@@ -0,0 +1,221 @@
+"""
+Ballar uchun write-behind bufer (quiz va tezkor so'zlar javoblari).
+
+Har bir javob uchun alohida tranzaksiya ochilmaydi: buffer_points() faqat
+xotiradagi (user_id, source) -> delta_x10 ga qo'shadi. Fon thread har
+POINTS_BUFFER_FLUSH_MS da yoki POINTS_BUFFER_MAX_EVENTS ta hodisa yig'ilganda
+hammasini bitta tranzaksiyada users.points_x10 ga yozadi va jurnalga
+(database/ledger.py) har bir (user, source) uchun bitta hodisa qo'yadi.
+
+get_points() pending deltalarni ham qo'shib qaytaradi (read-your-writes),
+lock ushlamasdan: flush hisoblagichi (_flush_seq) o'qish davomida o'zgarmagan
+bo'lsa natija aniq, aks holda (kam holat) flush tugashini kutib qayta o'qiydi.
+Bot to'xtaganda main.py flush_points_buffer() ni o'zi chaqiradi (SIGTERM da
+atexit ishlamaydi), atexit - zaxira.
+"""
+
+import atexit
+import threading
+import time
+
+from database.write_retry import WriteRetry
+
+# Sozlamalar
+POINTS_BUFFER_FLUSH_MS = 250      # shuncha ms da bir yoziladi
+POINTS_BUFFER_MAX_EVENTS = 200    # shuncha hodisa yig'ilsa kutmasdan yoziladi
+
+# (user_id, source) -> delta_x10
+_pending = {}
+_pending_events = 0
+_pending_lock = threading.Lock()
+
+# Bir vaqtda bitta flush
+_flush_lock = threading.Lock()
+# _pending_lock ostida: toq - partiya xotiradan olingan, lekin hali commit
+# bo'lmagan (read_with_pending bu oraliqda DB + pending ga ishonmaydi)
+_flush_seq = 0
+
+_retry = WriteRetry("points_buffer")
+
+_wakeup = threading.Event()
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+_metrics = {
+    "events_buffered": 0,
+    "events_flushed": 0,
+    "commits": 0,
+    "rows_updated": 0,
+    "last_flush_ms": 0.0,
+    "max_flush_ms": 0.0,
+    "errors": 0,
+}
+
+
+def buffer_points(user_id: int, amount, source: str):
+    """Ball o'zgarishini buferga qo'shadi (DBga keyinroq, guruh bilan yoziladi)."""
+    global _pending_events
+    from database.database import points_to_x10
+
+    delta_x10 = points_to_x10(amount)
+    if not delta_x10:
+        return
+
+    _ensure_writer()
+    key = (int(user_id), source)
+    with _pending_lock:
+        _pending[key] = _pending.get(key, 0) + delta_x10
+        _pending_events += 1
+        _metrics["events_buffered"] += 1
+        full = _pending_events >= POINTS_BUFFER_MAX_EVENTS
+
+    if full:
+        _wakeup.set()
+
+
+def _pending_x10_locked(user_id: int) -> int:
+    return sum(v for (uid, _), v in _pending.items() if uid == user_id)
+
+
+def get_pending_x10(user_id: int) -> int:
+    """Userning hali DBga yozilmagan ball o'zgarishi (x10)."""
+    user_id = int(user_id)
+    with _pending_lock:
+        return _pending_x10_locked(user_id)
+
+
+def read_with_pending(user_id: int, read_x10) -> int:
+    """
+    read_x10(): DBdagi points_x10. Pending delta bilan birga, flush
+    o'rtasiga tushib qolmasdan (ikki marta yoki umuman sanalmasdan) qaytaradi.
+    """
+    user_id = int(user_id)
+    with _pending_lock:
+        seq = _flush_seq
+    if seq % 2 == 0:
+        value = read_x10()
+        with _pending_lock:
+            if _flush_seq == seq:
+                # o'qish davomida hech qanday partiya yo'lda bo'lmagan
+                return value + _pending_x10_locked(user_id)
+
+    # flush o'rtasiga tushdi - tugashini kutib qayta o'qiymiz
+    with _flush_lock:
+        return read_x10() + get_pending_x10(user_id)
+
+
+def _write(batch: dict) -> list:
+    """Bitta tranzaksiya. return: yozilgan (user_id, source, delta_x10) lar."""
+    from database.database import get_connection
+
+    per_user = {}
+    for (user_id, _), delta_x10 in batch.items():
+        per_user[user_id] = per_user.get(user_id, 0) + delta_x10
+
+    updated = set()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        with conn:
+            for user_id, delta_x10 in per_user.items():
+                cursor.execute('''
+                    UPDATE users
+                    SET points_x10 = points_x10 + ?
+                    WHERE user_id = ?
+                ''', (delta_x10, user_id))
+                if cursor.rowcount > 0:
+                    updated.add(user_id)
+    finally:
+        cursor.close()
+
+    _metrics["rows_updated"] += len(updated)
+    return [
+        (user_id, source, delta_x10)
+        for (user_id, source), delta_x10 in batch.items()
+        if user_id in updated
+    ]
+
+
+def _requeue(items: list):
+    # _pending_lock flush_points_buffer da ushlangan
+    global _pending_events
+    for key, delta_x10 in items:
+        _pending[key] = _pending.get(key, 0) + delta_x10
+    _pending_events += len(items)
+
+
+def flush_points_buffer() -> int:
+    """Buferdagi hammasini hozir yozadi. return: yozilgan hodisalar soni."""
+    global _pending_events, _flush_seq
+    from database.ledger import record_points_event
+    from database.database import notify_points_changed
+
+    with _flush_lock:
+        with _pending_lock:
+            if not _pending:
+                return 0
+            batch = dict(_pending)
+            events = _pending_events
+            _pending.clear()
+            _pending_events = 0
+            _flush_seq += 1
+
+        started = time.perf_counter()
+        try:
+            written = _write(batch)
+        except Exception as e:
+            _metrics["errors"] += 1
+            print(f"[points_buffer] yozishda xatolik ({len(batch)} ta delta): {e}")
+            with _pending_lock:
+                _retry.failed(batch.items(), key=lambda kv: kv[0], requeue=_requeue, error=e)
+                _flush_seq += 1
+            return 0
+        with _pending_lock:
+            _flush_seq += 1
+        _retry.succeeded(batch)
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        _metrics["commits"] += 1
+        _metrics["events_flushed"] += events
+        _metrics["last_flush_ms"] = elapsed_ms
+        _metrics["max_flush_ms"] = max(_metrics["max_flush_ms"], elapsed_ms)
+
+    now = int(time.time())
+    for user_id, source, delta_x10 in written:
+        record_points_event(user_id, delta_x10, source, ts=now)
+    if written:
+        notify_points_changed(list({user_id for user_id, _, _ in written}))
+    return events
+
+
+def _writer_loop():
+    while True:
+        _wakeup.wait(POINTS_BUFFER_FLUSH_MS / 1000)
+        _wakeup.clear()
+        flush_points_buffer()
+
+
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is not None:
+        return
+    with _writer_lock:
+        if _writer_thread is None:
+            t = threading.Thread(target=_writer_loop, name="points-buffer", daemon=True)
+            t.start()
+            _writer_thread = t
+
+
+# ledger.flush_ledger dan keyin ro'yxatga olinadi -> atexit da undan oldin ishlaydi
+atexit.register(flush_points_buffer)
+
+
+def get_points_buffer_metrics() -> dict:
+    m = dict(_metrics)
+    with _pending_lock:
+        m["pending_events"] = _pending_events
+        m["pending_keys"] = len(_pending)
+    m["dropped"] = _retry.dropped
+    if m["commits"]:
+        m["events_per_commit"] = round(m["events_flushed"] / m["commits"], 1)
+    return m
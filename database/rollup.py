@@ -0,0 +1,153 @@
+"""
+Statistika hisoblagichlari (stats_rollup) va kunlik qatorlar (stats_rollup_daily).
+
+Qiymatlarni SQLite triggerlari yuritadi (migratsiya v5, v6, v7), shuning uchun
+/stats jadval hajmidan qat'i nazar bir nechta PRIMARY KEY o'qishi bilan javob
+beradi. Bu modulda:
+  - noldan hisoblash (migratsiya va tekshiruv uchun),
+  - tekshiruvchi: qayta hisoblaydi, farqni (drift) aytadi va tuzatadi,
+  - o'qish funksiyalari.
+"""
+
+import time
+
+# Global hisoblagichlar va ularni noldan hisoblaydigan so'rovlar
+ROLLUP_SOURCES = {
+    "users_total": "SELECT COUNT(*) FROM users",
+    "users_points_x10": "SELECT COALESCE(SUM(points_x10), 0) FROM users",
+    "users_positive_x10": "SELECT COALESCE(SUM(points_x10), 0) FROM users WHERE points_x10 > 0",
+    "users_negative_x10": "SELECT COALESCE(-SUM(points_x10), 0) FROM users WHERE points_x10 < 0",
+    "users_negative": "SELECT COUNT(*) FROM users WHERE points_x10 < 0",
+    "users_zero": "SELECT COUNT(*) FROM users WHERE points_x10 = 0",
+    "referrals_total": "SELECT COUNT(*) FROM referrals",
+    "courses_total": "SELECT COUNT(*) FROM courses",
+    "students_total": "SELECT COUNT(*) FROM students",
+    "students_approved": "SELECT COUNT(*) FROM students WHERE approved = 1",
+    "announcements_total": "SELECT COUNT(*) FROM announcements",
+    "gift_likes_total": "SELECT COUNT(*) FROM gift_likes",
+}
+
+# Kunlik qatorlar: (kalit, so'rov -> (day, value)). Kun - mahalliy sana.
+DAILY_SOURCES = {
+    "new_users": '''
+        SELECT DATE(joined_at, 'localtime'), COUNT(*)
+        FROM users WHERE joined_at IS NOT NULL
+        GROUP BY 1
+    ''',
+    "referrals": '''
+        SELECT DATE(created_at, 'localtime'), COUNT(*)
+        FROM referrals WHERE created_at IS NOT NULL
+        GROUP BY 1
+    ''',
+}
+
+
+def compute_rollup(cursor) -> dict:
+    """Hisoblagichlarni jadvallardan noldan hisoblaydi (O(n) - faqat tekshiruvda)."""
+    values = {}
+    for key, query in ROLLUP_SOURCES.items():
+        cursor.execute(query)
+        values[key] = cursor.fetchone()[0] or 0
+    return values
+
+
+def compute_rollup_daily(cursor) -> dict:
+    """(day, key) -> value, noldan."""
+    values = {}
+    for key, query in DAILY_SOURCES.items():
+        cursor.execute(query)
+        for day, value in cursor.fetchall():
+            values[(day, key)] = value
+    return values
+
+
+def write_rollup(cursor, values: dict, daily: dict):
+    """Hisoblagichlarni to'liq almashtiradi (chaqiruvchi tranzaksiyasi ichida)."""
+    cursor.executemany(
+        "INSERT OR REPLACE INTO stats_rollup (key, value) VALUES (?, ?)",
+        list(values.items())
+    )
+    cursor.execute("DELETE FROM stats_rollup_daily")
+    cursor.executemany(
+        "INSERT INTO stats_rollup_daily (day, key, value) VALUES (?, ?, ?)",
+        [(day, key, value) for (day, key), value in daily.items()]
+    )
+
+
+def get_rollup() -> dict:
+    """Barcha global hisoblagichlar: key -> value."""
+    from database.database import get_connection
+
+    cursor = get_connection().cursor()
+    try:
+        cursor.execute("SELECT key, value FROM stats_rollup")
+        values = dict(cursor.fetchall())
+    finally:
+        cursor.close()
+    return {key: values.get(key, 0) for key in ROLLUP_SOURCES}
+
+
+def get_rollup_daily(key: str, day: str | None = None) -> int:
+    """Kunlik qiymat (default: bugun, mahalliy sana)."""
+    from database.database import get_connection
+
+    if day is None:
+        day = time.strftime("%Y-%m-%d")
+    row = get_connection().execute(
+        "SELECT value FROM stats_rollup_daily WHERE day = ? AND key = ?", (day, key)
+    ).fetchone()
+    return row[0] if row else 0
+
+
+def verify_rollup(fix: bool = True) -> dict:
+    """
+    Hisoblagichlarni noldan qayta hisoblab, saqlanganlari bilan solishtiradi.
+    fix=True bo'lsa farq bo'lganda qayta yozadi (bitta IMMEDIATE tranzaksiyada,
+    hisoblash va yozish orasida boshqa yozuv kirib qolmaydi).
+    return: {"drift": {key: (saqlangan, haqiqiy)}, "daily_drift": {...},
+             "fixed": bool, "elapsed_ms": float}
+    """
+    from database.database import get_connection
+
+    started = time.perf_counter()
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN IMMEDIATE")
+
+        actual = compute_rollup(cursor)
+        actual_daily = compute_rollup_daily(cursor)
+
+        cursor.execute("SELECT key, value FROM stats_rollup")
+        stored = dict(cursor.fetchall())
+        cursor.execute("SELECT day, key, value FROM stats_rollup_daily")
+        stored_daily = {(day, key): value for day, key, value in cursor.fetchall()}
+
+        drift = {
+            key: (stored.get(key), value)
+            for key, value in actual.items()
+            if stored.get(key) != value
+        }
+        daily_drift = {
+            day_key: (stored_daily.get(day_key, 0), actual_daily.get(day_key, 0))
+            for day_key in set(actual_daily) | set(stored_daily)
+            if stored_daily.get(day_key, 0) != actual_daily.get(day_key, 0)
+        }
+
+        fixed = False
+        if fix and (drift or daily_drift):
+            write_rollup(cursor, actual, actual_daily)
+            fixed = True
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    return {
+        "drift": drift,
+        "daily_drift": daily_drift,
+        "fixed": fixed,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,66 @@
+"""
+Fon yozuvchilar (ledger, points_buffer, activity) uchun umumiy qayta urinish.
+
+Partiya yozilmasa elementlari keyingi flushga qaytariladi (yo'qolmasin), lekin
+har bir kalit chegaralangan: WRITE_MAX_ATTEMPTS marta va birinchi xatodan
+WRITE_RETRY_MIN_SEC o'tgach (qisqa "database is locked" kabi uzilishlarda
+ball yo'qolmasin) tashlanadi va bir marta logga yoziladi. Doimiy xato beradigan
+element har siklda abadiy aylanib yurmaydi.
+"""
+
+import threading
+import time
+
+WRITE_MAX_ATTEMPTS = 5
+WRITE_RETRY_MIN_SEC = 60
+
+
+class WriteRetry:
+    """Kalit -> (ketma-ket muvaffaqiyatsiz urinishlar, birinchi xato vaqti). Thread-safe."""
+
+    def __init__(self, name: str, max_attempts: int = WRITE_MAX_ATTEMPTS,
+                 min_sec: float = WRITE_RETRY_MIN_SEC):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.min_sec = min_sec
+        self.dropped = 0          # jami tashlangan elementlar (metrika)
+        self._attempts = {}
+        self._lock = threading.Lock()
+
+    def failed(self, items, key, requeue, error) -> int:
+        """
+        items - yozilmagan elementlar, key(item) - urinishlar sanaladigan kalit,
+        requeue(kept) - chegaraga yetmaganlarini qayta navbatga qo'yadi.
+        return: tashlanganlar soni.
+        """
+        kept, dropped = [], []
+        now = time.monotonic()
+        with self._lock:
+            for item in items:
+                k = key(item)
+                attempts, first = self._attempts.get(k, (0, now))
+                attempts += 1
+                if attempts >= self.max_attempts and now - first >= self.min_sec:
+                    self._attempts.pop(k, None)
+                    dropped.append(item)
+                else:
+                    self._attempts[k] = (attempts, first)
+                    kept.append(item)
+            self.dropped += len(dropped)
+
+        if kept:
+            requeue(kept)
+        if dropped:
+            print(
+                f"[{self.name}] {len(dropped)} ta element {self.max_attempts}+ urinishdan keyin "
+                f"tashlandi ({error}): {dropped[:5]}"
+            )
+        return len(dropped)
+
+    def succeeded(self, keys):
+        """Yozilgan kalitlarning hisoblagichi nolga qaytadi."""
+        if not self._attempts:
+            return
+        with self._lock:
+            for k in keys:
+                self._attempts.pop(k, None)
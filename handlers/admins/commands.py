@@ -3,9 +3,18 @@ from telebot.types import ReplyKeyboardMarkup, KeyboardButton
 
 from config import ADMINS
 from keyboards.default import main_menu_keyboard, admin_menu_keyboard
-from database.database import add_admin_group, get_points, create_connection
+from database.database import add_admin_group, get_points
 from utils.givepoint import find_user_by_username, give_points_to_user, take_points_from_user
 from utils.stats import get_bot_stats
+from database.rollup import verify_rollup
+from utils.referral_sweeper import get_sweeper_metrics
+from utils.subscription import get_subscription_metrics
+from database.ledger import get_ledger_metrics
+from database.points_buffer import get_points_buffer_metrics
+from utils.leaderboard import get_leaderboard_metrics
+from handlers.users.top_users import get_top_users_cache_metrics
+from utils.activity import get_activity_metrics
+from utils.media_cache import get_media_cache_metrics
 
 """Admin command handlers.
 
@@ -350,61 +359,9 @@ def setup_admin_commands(bot):
 
         stats = get_bot_stats()
 
-        # ===================== YANGI STATLAR (DBdan) =====================
-        total_positive = 0
-        total_minus_abs = 0
-        negative_users = 0
-        zero_users = 0
-        new_users_24h = 0
-        new_users_7d = 0
-        pending_referrals = 0
-
-        conn = create_connection()
-        cursor = conn.cursor()
-        try:
-            # + ball jamlanmasi
-            cursor.execute("""
-                SELECT COALESCE(SUM(CASE WHEN COALESCE(points,0) > 0 THEN points ELSE 0 END), 0)
-                FROM users
-            """)
-            total_positive = cursor.fetchone()[0] or 0
-
-            # - ball jamlanmasi (musbat ko'rinishda)
-            cursor.execute("""
-                SELECT COALESCE(SUM(CASE WHEN COALESCE(points,0) < 0 THEN -points ELSE 0 END), 0)
-                FROM users
-            """)
-            total_minus_abs = cursor.fetchone()[0] or 0
-
-            # manfiy balli userlar
-            cursor.execute("SELECT COUNT(*) FROM users WHERE COALESCE(points,0) < 0")
-            negative_users = cursor.fetchone()[0] or 0
-
-            # 0 balli userlar
-            cursor.execute("SELECT COUNT(*) FROM users WHERE COALESCE(points,0) = 0")
-            zero_users = cursor.fetchone()[0] or 0
-
-            # so'nggi 24 soatda yangi userlar
-            cursor.execute("SELECT COUNT(*) FROM users WHERE joined_at >= DATETIME('now','-1 day')")
-            new_users_24h = cursor.fetchone()[0] or 0
-
-            # so'nggi 7 kunda yangi userlar
-            cursor.execute("SELECT COUNT(*) FROM users WHERE joined_at >= DATETIME('now','-7 day')")
-            new_users_7d = cursor.fetchone()[0] or 0
-
-            # pending referral (jadval bo'lmasa ham xato bermasin)
-            try:
-                cursor.execute("SELECT COUNT(*) FROM pending_referrals")
-                pending_referrals = cursor.fetchone()[0] or 0
-            except Exception:
-                pending_referrals = 0
-
-        finally:
-            conn.close()
-
         # referral conversion (foydali indikator)
-        total_users = stats.get('total_users', 0) or 0
-        total_referrals = stats.get('total_referrals', 0) or 0
+        total_users = stats.total_users
+        total_referrals = stats.total_referrals
         if total_users > 0:
             referral_rate = round((total_referrals / total_users) * 100, 2)
         else:
@@ -412,7 +369,7 @@ def setup_admin_commands(bot):
 
         # top user text
         top_user_text = "Top foydalanuvchi hali yo'q."
-        tu = stats.get("top_user")
+        tu = stats.top_user
         if tu:
             top_user_text = (
                 f"{tu['display']}\n"
@@ -420,27 +377,94 @@ def setup_admin_commands(bot):
                 f"   Ballari: {tu['points']}"
             )
 
+        sweep = get_sweeper_metrics()
+        sub = get_subscription_metrics()
+        ledger = get_ledger_metrics()
+        pbuf = get_points_buffer_metrics()
+        lb = get_leaderboard_metrics()
+        top_cache = get_top_users_cache_metrics()
+        act = get_activity_metrics()
+        media = get_media_cache_metrics()
+
         text = (
             "📊 BOT STATISTIKASI\n\n"
-            f"👥 Jami foydalanuvchilar: {stats.get('total_users', 0)}\n"
-            f"💰 Jami ball (sof): {stats.get('total_points', 0)}\n"
-            f"➕ Jami qo‘shilgan ball: {total_positive}\n"
-            f"➖ Jami ayirilgan ball: {total_minus_abs}\n"
-            f"📈 O'rtacha ball: {stats.get('avg_points', 0)}\n"
-            f"⚠️ Manfiy balli userlar: {negative_users}\n"
-            f"⭕ 0 balli userlar: {zero_users}\n\n"
+            f"👥 Jami foydalanuvchilar: {stats.total_users}\n"
+            f"💰 Jami ball (sof): {stats.total_points}\n"
+            f"➕ Jami qo‘shilgan ball: {stats.total_positive}\n"
+            f"➖ Jami ayirilgan ball: {stats.total_minus_abs}\n"
+            f"📈 O'rtacha ball: {stats.avg_points}\n"
+            f"⚠️ Manfiy balli userlar: {stats.negative_users}\n"
+            f"⭕ 0 balli userlar: {stats.zero_users}\n\n"
             f"🤝 Jami takliflar (referrals): {total_referrals}\n"
             f"📌 Referral konversiya: {referral_rate}%\n"
-            f"⏳ Pending referral (hali tasdiqlanmagan): {pending_referrals}\n\n"
-            f"🆕 Oxirgi 24 soatda yangi userlar: {new_users_24h}\n"
-            f"🗓 Oxirgi 7 kunda yangi userlar: {new_users_7d}\n\n"
-            f"📚 Kurslar soni: {stats.get('total_courses', 0)}\n"
-            f"🎓 Talabalar: {stats.get('total_students', 0)} ta\n"
-            f"✅ Tasdiqlangan talabalar: {stats.get('approved_students', 0)} ta\n\n"
-            f"📢 E'lonlar soni: {stats.get('total_announcements', 0)}\n"
-            f"❤️ Sovg'a bo'limi likelari: {stats.get('total_gift_likes', 0)}\n\n"
+            f"⏳ Pending referral (hali tasdiqlanmagan): {stats.pending_referrals}\n"
+            f"🔄 Fon tekshiruvi: {sweep['activated']} ta faollashdi, {sweep['expired']} ta eskirdi, "
+            f"{sweep['api_calls']} API ({sweep['last_rate_per_sec']}/s)\n\n"
+            f"🆕 Oxirgi 24 soatda yangi userlar: {stats.new_users_24h}\n"
+            f"🗓 Oxirgi 7 kunda yangi userlar: {stats.new_users_7d}\n\n"
+            f"📅 Bugun berilgan ball (sof): {stats.today_points}\n"
+            f"📆 Oxirgi 7 kunda berilgan ball (sof): {stats.week_points}\n\n"
+            f"📚 Kurslar soni: {stats.total_courses}\n"
+            f"🎓 Talabalar: {stats.total_students} ta\n"
+            f"✅ Tasdiqlangan talabalar: {stats.approved_students} ta\n\n"
+            f"📢 E'lonlar soni: {stats.total_announcements}\n"
+            f"❤️ Sovg'a bo'limi likelari: {stats.total_gift_likes}\n\n"
             f"🏆 Eng ko'p ball to'plagan foydalanuvchi:\n{top_user_text}\n\n"
-            f"💾 Oxirgi backup vaqti: {stats.get('last_backup', '-')}\n\n"
+            f"💾 Oxirgi backup vaqti: {stats.last_backup}\n\n"
+            f"📡 Obuna keshi: {sub['hits']} hit / {sub['misses']} miss "
+            f"({sub['hit_rate']}%), {sub['api_calls']} API\n"
+            f"📒 Ball jurnali: {ledger['events_written']} hodisa / {ledger['batches']} commit, "
+            f"navbatda {ledger['queued']}, xato {ledger['errors']}, tashlangan {ledger['dropped']} "
+            f"(oxirgi {ledger['last_flush_ms']} ms)\n"
+            f"🧮 Ball buferi: kutmoqda {pbuf['pending_events']}, {pbuf['commits']} flush, "
+            f"{pbuf.get('events_per_commit', 0)} hodisa/flush, "
+            f"{pbuf['last_flush_ms']} ms (maks {pbuf['max_flush_ms']} ms), "
+            f"xato {pbuf['errors']}, tashlangan {pbuf['dropped']}\n"
+            f"🏆 Reyting (xotira): {lb['users']} user, {lb['updates']} yangilanish, "
+            f"{lb['reconciles']} solishtirish, farq {lb['last_drift']} (jami {lb['total_drift']}), "
+            f"qayta qurish {lb['last_reload_ms']} ms\n"
+            f"🗂 Top-10 matn keshi: {top_cache['hits']} hit / {top_cache['misses']} qayta qurish\n"
+            f"🟢 Faollik: {act['tracked']} user xotirada, kutmoqda {act['pending']}, "
+            f"{act['touches']} belgi -> {act['rows_written']} qator / {act['flushes']} flush "
+            f"(oxirgi {act['last_flush_ms']} ms), xato {act['errors']}, tashlangan {act['dropped']}\n"
+            f"🖼 Rasm file_id keshi: {media['cached']} ta, {media['hits']} hit / {media['uploads']} yuklash, "
+            f"qayta xesh {media['rehashed']}, rad etilgan {media['rejected']}\n"
+            f"⏱ Hisoblash: {stats.elapsed_ms} ms"
         )
 
         bot.send_message(message.chat.id, text)
+
+    # ===================== /verifystats — HISOBLAGICHLARNI TEKSHIRISH =====================
+
+    @bot.message_handler(commands=['verifystats'])
+    def cmd_verify_stats(message):
+        if message.from_user.id not in ADMINS:
+            bot.send_message(message.chat.id, "❌ Bu buyruq faqat adminlar uchun.")
+            return
+
+        try:
+            report = verify_rollup(fix=True)
+        except Exception as e:
+            print(f"verify_rollup xatosi: {e}")
+            bot.send_message(message.chat.id, "❌ Tekshirishda xatolik yuz berdi.")
+            return
+
+        drift = report["drift"]
+        daily_drift = report["daily_drift"]
+        if not drift and not daily_drift:
+            bot.send_message(
+                message.chat.id,
+                f"✅ Statistika hisoblagichlari to'g'ri (farq yo'q).\n⏱ {report['elapsed_ms']} ms"
+            )
+            return
+
+        lines = ["⚠️ Hisoblagichlarda farq topildi va tuzatildi:\n"]
+        for key, (stored, actual) in sorted(drift.items()):
+            lines.append(f"• {key}: {stored} → {actual}")
+        if daily_drift:
+            lines.append(f"\n📅 Kunlik qatorlarda farq: {len(daily_drift)} ta")
+            for (day, key), (stored, actual) in sorted(daily_drift.items())[:10]:
+                lines.append(f"• {day} {key}: {stored} → {actual}")
+        lines.append(f"\n⏱ {report['elapsed_ms']} ms")
+
+        bot.send_message(message.chat.id, "\n".join(lines))
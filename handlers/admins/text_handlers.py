@@ -1,17 +1,18 @@
 import telebot
 import sqlite3
 import os
-import csv
-from io import StringIO
-from telebot.types import ReplyKeyboardRemove
+import threading
+from telebot.types import ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from config import DATABASE_PATH, ADMINS
 from database.database import (
     get_approved_students,  # hozir ishlatmaymiz, lekin qolsin xalaqit bermaydi
     add_announcement, get_courses,
     get_all_teachers, delete_teacher, delete_course,
-    get_all_admin_groups, get_all_users,
-    get_all_users_with_stats,  # 🔥 YANGI: users + ball + referrals
+    get_all_admin_groups,
+    get_users_total,
 )
+from utils.export import export_users
+from utils.broadcast import create_broadcast, start_broadcast
 from keyboards.default import admin_menu_keyboard, yes_no_keyboard, main_menu_keyboard
 from keyboards.inline import (
     generate_courses_keyboard, generate_teachers_keyboard,
@@ -90,33 +91,43 @@ def setup_admin_text_handlers(bot):
     def export_students(message):
         """
         Endi bu yerda 'tasdiqlangan students' emas,
-        start bosgan BARCHA foydalanuvchilarni CSV qilib beramiz.
+        start bosgan BARCHA foydalanuvchilarni eksport qilamiz (format tanlanadi).
         """
-        users = get_all_users_with_stats()  # (user_id, username, full_name, joined_at, points, referrals)
-
-        if users:
-            output = StringIO()
-            writer = csv.writer(output)
-            writer.writerow(['User ID', 'Ism Familiya', 'Username', "Ro'yxatdan o'tgan vaqt", 'Ball', 'Takliflar soni'])
-
-            for user_id, username, full_name, joined_at, points, refs in users:
-                writer.writerow([
-                    user_id,
-                    full_name or "",
-                    username or "",
-                    joined_at or "",
-                    points or 0,
-                    refs or 0
-                ])
-
-            output.seek(0)
-            bot.send_document(
-                message.chat.id,
-                ('users.csv', output.getvalue()),
-                caption="✅ Foydalanuvchilar ro'yxati (start bosganlar)"
-            )
-        else:
+        if not get_users_total():
             bot.send_message(message.chat.id, "❌ Hozircha birorta ham foydalanuvchi yo'q.")
+            return
+
+        kb = InlineKeyboardMarkup(row_width=2)
+        kb.add(
+            InlineKeyboardButton("📄 CSV (.gz)", callback_data="export_users|csv"),
+            InlineKeyboardButton("📊 Excel (.xlsx)", callback_data="export_users|xlsx"),
+        )
+        bot.send_message(message.chat.id, "📥 Qaysi formatda yuklab olasiz?", reply_markup=kb)
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith("export_users|") and call.from_user.id in ADMINS)
+    def export_students_format(call):
+        fmt = call.data.split("|", 1)[1]
+        if not _export_lock.acquire(blocking=False):
+            bot.answer_callback_query(call.id, "⏳ Eksport allaqachon ketmoqda, biroz kuting.", show_alert=True)
+            return
+
+        bot.answer_callback_query(call.id)
+        try:
+            bot.edit_message_text(
+                "⏳ Eksport boshlandi...",
+                call.message.chat.id,
+                call.message.message_id,
+            )
+        except Exception as e:
+            print(f"Eksport xabarini yangilab bo'lmadi: {e}")
+
+        # handler threadini band qilmaslik uchun fon threadda
+        threading.Thread(
+            target=_run_export,
+            args=(bot, call.message.chat.id, call.message.message_id, fmt),
+            name="users-export",
+            daemon=True,
+        ).start()
 
     # Guruhlar ro'yxatini ko'rish
     @bot.message_handler(func=lambda message: message.text == "📋 Guruhlar ro'yxati" and message.from_user.id in ADMINS)
@@ -131,6 +142,45 @@ def setup_admin_text_handlers(bot):
             bot.send_message(message.chat.id, "❌ Hozircha hech qanday guruh mavjud emas.")
 
 
+# Bir vaqtda faqat bitta eksport (katta fayl ikki marta yozilmasin)
+_export_lock = threading.Lock()
+
+
+def _run_export(bot, chat_id, status_message_id, fmt):
+    def progress(done, total):
+        percent = f" ({done * 100 // total}%)" if total else ""
+        bot.edit_message_text(
+            f"⏳ Eksport: {done}/{total}{percent}",
+            chat_id,
+            status_message_id,
+        )
+
+    try:
+        fileobj, file_name, rows, elapsed = export_users(fmt, progress)
+        try:
+            bot.send_document(
+                chat_id,
+                (file_name, fileobj),
+                caption=f"✅ Foydalanuvchilar ro'yxati (start bosganlar)\n"
+                        f"👥 {rows} ta | ⏱ {elapsed} s"
+            )
+        finally:
+            fileobj.close()
+
+        try:
+            bot.edit_message_text(f"✅ Eksport tayyor: {rows} ta, {elapsed} s", chat_id, status_message_id)
+        except Exception:
+            pass
+    except Exception as e:
+        print(f"Eksportda xatolik: {e}")
+        try:
+            bot.send_message(chat_id, f"❌ Eksportda xatolik: {e}")
+        except Exception:
+            pass
+    finally:
+        _export_lock.release()
+
+
 def process_course_name(message, bot):
     course_name = message.text
     from database.database import add_course
@@ -143,10 +193,19 @@ def process_course_name(message, bot):
 
 
 def process_announcement(message, bot):
-    announcement_text = message.text
+    announcement_text = message.text or message.caption
     image_path = None
+    photo_file_id = None
+
+    if not announcement_text and not message.photo:
+        bot.send_message(message.chat.id, "❌ E'lon matn yoki rasm bo'lishi kerak.",
+                         reply_markup=admin_menu_keyboard())
+        return
 
     if message.photo:
+        # Telegramdagi file_id - har bir userga faylni qayta yuklamaymiz
+        photo_file_id = message.photo[-1].file_id
+
         # Rasmni saqlash
         file_info = bot.get_file(message.photo[-1].file_id)
         downloaded_file = bot.download_file(file_info.file_path)
@@ -159,18 +218,10 @@ def process_announcement(message, bot):
     # E'londan DB ga saqlash
     add_announcement(announcement_text, image_path)
 
-    # 🔥 Hamma foydalanuvchilarga yuborish
-    users = get_all_users()
-    for user_id in users:
-        try:
-            if image_path:
-                with open(image_path, 'rb') as photo:
-                    bot.send_photo(user_id, photo, caption=announcement_text)
-            else:
-                bot.send_message(user_id, announcement_text)
-        except Exception as e:
-            print(f"❌ {user_id} ga yuborishda xatolik: {e}")
-
-    bot.send_message(message.chat.id,
-                     "✅ E'lon saqlandi va barcha foydalanuvchilarga yuborildi!",
+    # 🔥 Hamma foydalanuvchilarga yuborish - fonda (utils/broadcast.py), progress shu xabarda
+    bot.send_message(message.chat.id, "✅ E'lon saqlandi, foydalanuvchilarga yuborilmoqda.",
                      reply_markup=admin_menu_keyboard())
+    status_msg = bot.send_message(message.chat.id, "⏳ E'lon navbatga qo'yildi...")
+    job_id = create_broadcast(message.chat.id, status_msg.message_id, announcement_text,
+                              image_path, photo_file_id)
+    start_broadcast(bot, job_id)
@@ -1,11 +1,13 @@
 import os
 import zipfile
 import shutil
+import tempfile
 
 from telebot.types import ReplyKeyboardMarkup, KeyboardButton
 
 from config import ADMINS, DATABASE_PATH
-from database.database import add_admin_group, delete_admin_group
+from database.database import add_admin_group, delete_admin_group, backup_to_file, restore_from_file
+from utils.channel_members import load_channel_members, start_channel_reconcile
 
 BACKUP_DIR = "backups"
 
@@ -30,7 +32,14 @@ def safe_backup_database() -> str | None:
             # 1) Database
             if os.path.exists(DATABASE_PATH):
                 # Zip ichida DB asl yo'li bilan saqlanadi
-                zf.write(DATABASE_PATH, arcname=DATABASE_PATH)
+                # (WAL rejimida izchil snapshot olamiz)
+                fd, snapshot = tempfile.mkstemp(suffix=".db")
+                os.close(fd)
+                try:
+                    backup_to_file(snapshot)
+                    zf.write(snapshot, arcname=DATABASE_PATH)
+                finally:
+                    os.remove(snapshot)
             else:
                 print(f"[MANUAL BACKUP] Ogohlantirish: DATABASE_PATH topilmadi: {DATABASE_PATH}")
 
@@ -68,9 +77,10 @@ def safe_backup_database() -> str | None:
         return None
 
 
-def safe_restore_database() -> str | None:
+def safe_restore_database(bot=None) -> str | None:
     """
     Admin tugmasi uchun manual restore.
+    bot berilsa kanal a'zoligi tiklangan bazaga nisbatan qayta solishtiriladi.
     BACKUP_DIR ichidan ENGIN YANGI .zip faylni olib:
       - DATABASE_PATH faylini qayta yozadi,
       - images/, data/quiz, data/fastwords ni ustiga yozadi.
@@ -102,9 +112,19 @@ def safe_restore_database() -> str | None:
             for member in zf.namelist():
                 # Agar bu DB fayl bo'lsa (yo'li qanday bo'lishidan qat'i nazar)
                 if os.path.basename(member) == db_basename:
-                    os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-                    with zf.open(member) as src, open(DATABASE_PATH, "wb") as dst:
-                        shutil.copyfileobj(src, dst)
+                    # Faylni ustiga yozmaymiz (ochiq ulanishlar + WAL buziladi),
+                    # SQLite backup API orqali ishlab turgan bazaga tiklaymiz
+                    fd, extracted = tempfile.mkstemp(suffix=".db")
+                    os.close(fd)
+                    try:
+                        with zf.open(member) as src, open(extracted, "wb") as dst:
+                            shutil.copyfileobj(src, dst)
+                        restore_from_file(extracted)
+                        load_channel_members()
+                        if bot is not None:
+                            start_channel_reconcile(bot)
+                    finally:
+                        os.remove(extracted)
                     print(f"✅ DB tiklandi: {DATABASE_PATH}")
                     break
 
@@ -193,7 +213,7 @@ def setup_backup_handlers(bot):
             bot.send_message(message.chat.id, "❌ Sizda bu amal uchun ruxsat yo'q.")
             return
 
-        restored_file = safe_restore_database()
+        restored_file = safe_restore_database(bot)
         if restored_file:
             bot.send_message(
                 message.chat.id,
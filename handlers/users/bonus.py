@@ -3,7 +3,7 @@ import threading
 
 from keyboards.default import gift_menu_keyboard
 from utils.safe_telegram import safe_send_message
-from database.database import create_connection, claim_bonus_atomic, get_points
+from database.database import claim_bonus_atomic, get_points, get_last_bonus_claim_ts
 
 # Tugma textlari (keyboardda qaysi bo'lsa shuni qo'y)
 BONUS_BUTTON_TEXTS = {"🎲 Bonus", "🎁 Bonus", "Bonus", "🎰 Bonus"}
@@ -39,14 +39,10 @@ def _check_bonus_cooldown(user_id: int, cooldown_seconds: int):
     return: (ok: bool, wait_hms: str)
     """
     now = int(time.time())
-    conn = create_connection()
-    cur = conn.cursor()
     try:
-        cur.execute("SELECT last_claim_ts FROM bonus_claims WHERE user_id = ?", (user_id,))
-        row = cur.fetchone()
-        if row and row[0] is not None:
-            last_ts = int(row[0])
-            passed = now - last_ts
+        last_ts = get_last_bonus_claim_ts(user_id)
+        if last_ts is not None:
+            passed = now - int(last_ts)
             if passed < cooldown_seconds:
                 wait = cooldown_seconds - passed
                 return False, _format_hms(wait)
@@ -54,11 +50,6 @@ def _check_bonus_cooldown(user_id: int, cooldown_seconds: int):
     except Exception:
         # DBda muammo bo'lsa, userni qiynamaymiz
         return False, _format_hms(60)
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
 def _slot_reels_from_value(value: int):
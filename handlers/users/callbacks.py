@@ -4,14 +4,15 @@ from threading import Timer
 
 from config import ADMINS, CHANNEL_USERNAME
 from database.database import (
-    get_course_details,
-    get_teacher,
+    get_course_card,
     add_student,
     approve_student,
     delete_student,
     add_gift_like,
 )
 from keyboards.inline import back_button
+from utils.subscription import is_subscribed, invalidate_subscription
+from utils.media_cache import send_cached_photo
 from keyboards.default import phone_keyboard, yes_no_keyboard, main_menu_keyboard, admin_menu_keyboard
 
 
@@ -20,15 +21,9 @@ from keyboards.default import phone_keyboard, yes_no_keyboard, main_menu_keyboar
 def check_subscription(bot, user_id):
     """
     Foydalanuvchi kanalga obuna ekanligini tekshirish.
-    CHANNEL_USERNAME config da @ bilan turgan bo'lishi mumkin.
+    Natija utils/subscription.py da keshlanadi (TTL).
     """
-    try:
-        chat_identifier = CHANNEL_USERNAME if CHANNEL_USERNAME.startswith("@") else f"@{CHANNEL_USERNAME}"
-        member = bot.get_chat_member(chat_identifier, user_id)
-        return member.status in ["member", "administrator", "creator"]
-    except Exception as e:
-        print(f"Obuna tekshirish xatosi: {e}")
-        return False
+    return is_subscribed(bot, user_id)
 
 
 def show_subscription_request(bot, message):
@@ -60,8 +55,9 @@ def show_subscription_request(bot, message):
 
 def show_course_info(bot, message, course_id):
     try:
-        course_info = get_course_details(course_id)
-        teacher_info = get_teacher(course_id)
+        card = get_course_card(course_id)
+        course_info = card["details"] if card else None
+        teacher_info = card["teacher"] if card else None
 
         if course_info:
             price, schedule, description, image_path, course_name = course_info
@@ -85,8 +81,7 @@ def show_course_info(bot, message, course_id):
 
             if image_path:
                 try:
-                    with open(image_path, "rb") as photo:
-                        bot.send_photo(message.chat.id, photo, caption=response, reply_markup=keyboard)
+                    send_cached_photo(bot, message.chat.id, image_path, caption=response, reply_markup=keyboard)
                 except Exception:
                     bot.send_message(message.chat.id, response, reply_markup=keyboard)
             else:
@@ -100,7 +95,8 @@ def show_course_info(bot, message, course_id):
 
 def show_teacher_info(bot, message, course_id):
     try:
-        teacher_info = get_teacher(course_id)
+        card = get_course_card(course_id)
+        teacher_info = card["teacher"] if card else None
 
         if teacher_info:
             teacher_id, full_name, achievements, image_path = teacher_info
@@ -114,8 +110,7 @@ def show_teacher_info(bot, message, course_id):
 
             if image_path:
                 try:
-                    with open(image_path, "rb") as photo:
-                        bot.send_photo(message.chat.id, photo, caption=response, reply_markup=keyboard)
+                    send_cached_photo(bot, message.chat.id, image_path, caption=response, reply_markup=keyboard)
                 except Exception:
                     bot.send_message(message.chat.id, response, reply_markup=keyboard)
             else:
@@ -159,7 +154,7 @@ def process_phone_step(message, bot, course_id, full_name):
         else:
             phone_number = message.text
 
-        add_student(full_name, phone_number, message.from_user.username, course_id)
+        student_id = add_student(full_name, phone_number, message.from_user.username, course_id)
 
         response = f"""
 ✅ Sizning ma'lumotlaringiz qabul qilindi!
@@ -170,15 +165,17 @@ def process_phone_step(message, bot, course_id, full_name):
 ⚠️ Diqqat! Agar «Ha» tugmasini bosangiz, adminlarimiz sizga telefon qilib bog'lanishadi va kurs haqida ma'lumot berishadi.
 """
         bot.send_message(message.chat.id, response, reply_markup=yes_no_keyboard())
-        bot.register_next_step_handler(message, process_confirmation, bot, full_name, phone_number, course_id)
+        bot.register_next_step_handler(
+            message, process_confirmation, bot, student_id, full_name, phone_number, course_id
+        )
     except Exception as e:
         print(f"Telefon qadamida xatolik: {e}")
 
 
-def process_confirmation(message, bot, full_name, phone_number, course_id):
+def process_confirmation(message, bot, student_id, full_name, phone_number, course_id):
     try:
         if message.text == "✅ Ha":
-            approve_student(full_name, phone_number, course_id)
+            approve_student(student_id)
 
             for admin_id in ADMINS:
                 try:
@@ -198,7 +195,7 @@ def process_confirmation(message, bot, full_name, phone_number, course_id):
                 reply_markup=main_menu_keyboard(),
             )
         else:
-            delete_student(full_name, phone_number, course_id)
+            delete_student(student_id)
             bot.send_message(
                 message.chat.id,
                 "❌ Ro'yxatdan o'tish bekor qilindi.",
@@ -282,6 +279,8 @@ def setup_user_callbacks(bot):
     @bot.callback_query_handler(func=lambda call: call.data == "check_subscription")
     def check_subscription_callback(call):
         try:
+            # foydalanuvchi hozirgina obuna bo'lgan bo'lishi mumkin - keshga ishonmaymiz
+            invalidate_subscription(call.from_user.id)
             if check_subscription(bot, call.from_user.id):
                 # ✅ Referral: if user came via referral and was pending,
                 # activate bonus right after subscription is confirmed.
@@ -368,13 +367,13 @@ def setup_user_callbacks(bot):
 
         sent = None
         try :
-            with open(IMAGE_PATH, "rb") as photo :
-                sent = bot.send_photo(
-                    chat_id,
-                    photo,
-                    caption=caption,
-                    message_effect_id="5104841245755180586",
-                )
+            sent = send_cached_photo(
+                bot,
+                chat_id,
+                IMAGE_PATH,
+                caption=caption,
+                message_effect_id="5104841245755180586",
+            )
         except FileNotFoundError :
             print(f"Like rasm topilmadi: {IMAGE_PATH}")
         except Exception as e :
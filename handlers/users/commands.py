@@ -5,7 +5,7 @@ from config import ADMINS
 from keyboards.default import main_menu_keyboard, admin_menu_keyboard
 from handlers.users.callbacks import check_subscription, show_subscription_request
 
-from database.database import add_user, create_connection
+from database.database import add_user, user_exists
 from handlers.users.referrals import set_pending_referral, try_activate_pending_referral
 
 
@@ -18,13 +18,7 @@ def _is_user_exists_in_db(user_id: int) -> bool:
     users jadvalida user bor-yo'qligini tekshiradi.
     'Yangi user' sharti uchun kerak.
     """
-    conn = create_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("SELECT 1 FROM users WHERE user_id = ? LIMIT 1", (user_id,))
-        return cur.fetchone() is not None
-    finally:
-        conn.close()
+    return user_exists(user_id)
 
 
 def setup_user_commands(bot):
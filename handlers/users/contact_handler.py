@@ -12,7 +12,7 @@ def setup_contact_handler(bot) :
             phone_number = message.text
 
         # Ma'lumotlarni saqlash
-        add_student(full_name, phone_number, message.from_user.username, course_id)
+        student_id = add_student(full_name, phone_number, message.from_user.username, course_id)
 
         # Tasdiqlash so'rovi
         response = f"""
@@ -24,12 +24,12 @@ def setup_contact_handler(bot) :
 ⚠️ Diqqat! Agar «Ha» tugmasini bosangiz, adminlarimiz sizga telefon qilib bog'lanishadi va kurs haqida ma'lumot berishadi.
 """
         bot.send_message(message.chat.id, response, reply_markup=yes_no_keyboard())
-        bot.register_next_step_handler(message, process_confirmation, bot, full_name, phone_number, course_id)
+        bot.register_next_step_handler(message, process_confirmation, bot, student_id, full_name, phone_number, course_id)
 
-    def process_confirmation(message, bot, full_name, phone_number, course_id) :
+    def process_confirmation(message, bot, student_id, full_name, phone_number, course_id) :
         if message.text == "✅ Ha" :
             # Ma'lumotlarni tasdiqlash
-            approve_student(full_name, phone_number, course_id)
+            approve_student(student_id)
 
             # Adminlarga xabar berish
             for admin_id in ADMINS :
@@ -43,7 +43,7 @@ def setup_contact_handler(bot) :
                              reply_markup=main_menu_keyboard())
         else :
             # Ma'lumotlarni o'chirish
-            delete_student(full_name, phone_number, course_id)
+            delete_student(student_id)
             bot.send_message(message.chat.id, "❌ Ro'yxatdan o'tish bekor qilindi.", reply_markup=main_menu_keyboard())
 
     return process_phone_step, process_confirmation
\ No newline at end of file
@@ -5,7 +5,8 @@ import difflib
 from typing import List
 
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils.points import add_points
+from utils.points import add_points_buffered
+from database.ledger import SOURCE_FASTWORDS
 
 # 🔍 Root papka (Optimum/)
 ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
@@ -469,7 +470,7 @@ def setup_fastwords_handlers(bot):
         if is_correct:
             # ✅ To'g'ri javob — ball qo‘shamiz (xato bo'lsa ham jim)
             try:
-                add_points(user_id, added_points)
+                add_points_buffered(user_id, added_points, SOURCE_FASTWORDS)
             except Exception:
                 pass
 
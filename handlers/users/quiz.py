@@ -3,7 +3,8 @@ import json
 import random
 import time
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-from utils.points import add_points
+from utils.points import add_points_buffered
+from database.ledger import SOURCE_QUIZ
 
 # Har bir foydalanuvchi uchun quiz session ma'lumoti
 # {
@@ -362,7 +363,7 @@ def setup_quiz_handlers(bot):
 
             # Ball qo'shish/ayirish (xato bo'lsa ham silent)
             try:
-                add_points(user_id, float(delta))
+                add_points_buffered(user_id, float(delta), SOURCE_QUIZ)
             except Exception:
                 pass
 
@@ -1,95 +1,23 @@
-import sqlite3
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-from config import DATABASE_PATH, CHANNEL_USERNAME
-from database.database import add_referral, get_referrals_count, get_referrals_for_user
+from config import CHANNEL_USERNAME
+from database.database import (
+    get_referrals_count,
+    get_referrals_page,
+    set_pending_referral,
+    get_pending_referrer,
+    activate_pending_referral,
+)
 from utils.points import get_points
 
 # We reuse the single subscription checker used across the project.
 from handlers.users.callbacks import check_subscription
+from utils.subscription import invalidate_subscription
 
 
 BOT_USERNAME_CACHE = None
 
 
-# =========================
-# DB: pending_referrals
-# =========================
-
-def _conn():
-    return sqlite3.connect(DATABASE_PATH)
-
-
-def _init_pending_table():
-    """
-    Pending referrals: bonus hali berilmagan referral'lar.
-    referred_id PRIMARY KEY -> bitta user faqat 1 marta pending bo'ladi.
-    """
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS pending_referrals (
-                referred_id INTEGER PRIMARY KEY,
-                referrer_id INTEGER NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        conn.commit()
-    finally:
-        conn.close()
-
-
-def set_pending_referral(referrer_id: int, referred_id: int) -> bool:
-    """
-    /start arg orqali kelgan referral'ni pending qilib qo'yadi.
-    return True = yozildi, False = yozilmadi (bor yoki self-ref)
-    """
-    if not referrer_id or not referred_id:
-        return False
-    if referrer_id == referred_id:
-        return False
-
-    _init_pending_table()
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            "INSERT OR IGNORE INTO pending_referrals (referred_id, referrer_id) VALUES (?, ?)",
-            (referred_id, referrer_id)
-        )
-        conn.commit()
-        return cur.rowcount > 0
-    finally:
-        conn.close()
-
-
-def get_pending_referrer(referred_id: int):
-    _init_pending_table()
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            "SELECT referrer_id FROM pending_referrals WHERE referred_id = ? LIMIT 1",
-            (referred_id,)
-        )
-        row = cur.fetchone()
-        return row[0] if row else None
-    finally:
-        conn.close()
-
-
-def clear_pending_referral(referred_id: int):
-    _init_pending_table()
-    conn = _conn()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM pending_referrals WHERE referred_id = ?", (referred_id,))
-        conn.commit()
-    finally:
-        conn.close()
-
-
 # =========================
 # Bot username cache
 # =========================
@@ -114,66 +42,89 @@ def try_activate_pending_referral(bot, referred_id: int, bonus_points: int = 200
     """Activate a pending referral if conditions are met.
 
     Rules:
-    - Bonus is given only once (referred_id UNIQUE inside add_referral).
+    - Bonus is given only once (referred_id UNIQUE in referrals).
     - Referred user must be subscribed to the channel.
     - Pending record is cleared after attempt.
     """
 
-    # 1) Must be subscribed
-    if not check_subscription(bot, referred_id):
+    # 1) Must have pending (cheap PK read, before the Telegram API call)
+    if not get_pending_referrer(referred_id):
         return False
 
-    # 2) Must have pending
-    referrer_id = get_pending_referrer(referred_id)
-    if not referrer_id:
+    # 2) Must be subscribed
+    if not check_subscription(bot, referred_id):
         return False
 
-    # 3) Give bonus (referred_id UNIQUE inside add_referral)
-    success = add_referral(referrer_id, referred_id, bonus_points=bonus_points)
-
-    # 4) Clear pending regardless (prevents repeated prompts)
-    clear_pending_referral(referred_id)
+    # 3) Lookup + bonus + clear pending in one transaction
+    referrer_id = activate_pending_referral(referred_id, bonus_points=bonus_points)
+    success = referrer_id is not None
 
     if success:
+        notify_referrer(bot, referrer_id, referred_id, bonus_points)
+
+    return success
+
+
+def notify_referrer(bot, referrer_id: int, referred_id: int, bonus_points: int = 200, bucket=None):
+    """
+    Referrerga bonus haqida xabar (get_chat + send_message).
+    bucket (TokenBucket) berilsa har bir API chaqiruvdan oldin token olinadi.
+    """
+    try:
+        # Referred user haqida info (username/full_name) ni olib, referrerga ko'rsatamiz
+        display_name = f"ID: {referred_id}"
         try:
-            # Referred user haqida info (username/full_name) ni olib, referrerga ko'rsatamiz
-            display_name = f"ID: {referred_id}"
-            try:
-                ch = bot.get_chat(referred_id)
-                name = (getattr(ch, "first_name", "") or "").strip()
-                last = (getattr(ch, "last_name", "") or "").strip()
-                uname = (getattr(ch, "username", None) or None)
-                full = (f"{name} {last}".strip() or None)
-                if full and uname:
-                    display_name = f"{full} (@{uname})"
-                elif uname:
-                    display_name = f"@{uname}"
-                elif full:
-                    display_name = full
-            except Exception:
-                pass
-
-            mention = f'<a href="tg://user?id={referred_id}">{display_name}</a>'
-
-            bot.send_message(
-                referrer_id,
-                "✅ Sizning havolangiz bilan kelgan foydalanuvchi kanalga obuna bo'ldi.\n"
-                f"👤 Foydalanuvchi: {mention}\n"
-                f"🎁 Sizga +{bonus_points} ball berildi.",
-                parse_mode="HTML",
-                disable_web_page_preview=True,
-            )
+            if bucket is not None:
+                bucket.acquire()
+            ch = bot.get_chat(referred_id)
+            name = (getattr(ch, "first_name", "") or "").strip()
+            last = (getattr(ch, "last_name", "") or "").strip()
+            uname = (getattr(ch, "username", None) or None)
+            full = (f"{name} {last}".strip() or None)
+            if full and uname:
+                display_name = f"{full} (@{uname})"
+            elif uname:
+                display_name = f"@{uname}"
+            elif full:
+                display_name = full
         except Exception:
             pass
 
-    return success
+        mention = f'<a href="tg://user?id={referred_id}">{display_name}</a>'
+
+        if bucket is not None:
+            bucket.acquire()
+        bot.send_message(
+            referrer_id,
+            "✅ Sizning havolangiz bilan kelgan foydalanuvchi kanalga obuna bo'ldi.\n"
+            f"👤 Foydalanuvchi: {mention}\n"
+            f"🎁 Sizga +{bonus_points} ball berildi.",
+            parse_mode="HTML",
+            disable_web_page_preview=True,
+        )
+    except Exception:
+        pass
 
 
 # =========================
 # Text builder
 # =========================
 
-def build_referrals_text_and_kb(bot, user_id, username, full_name):
+def _page_callback(direction: str, row) -> str:
+    # ref_page|next|2026-02-22 05:38:58|123  (64 baytdan oshmaydi)
+    return f"ref_page|{direction}|{row[3]}|{row[4]}"
+
+
+def parse_page_callback(data: str):
+    """ "ref_page|dir|created_at|id" -> (direction, (created_at, id)) yoki None."""
+    try:
+        _, direction, created_at, ref_id = data.split("|", 3)
+        return direction, (created_at, int(ref_id))
+    except ValueError:
+        return None
+
+
+def build_referrals_text_and_kb(bot, user_id, username, full_name, page_cursor=None, direction="next"):
     bot_username = get_bot_username(bot)
 
     # referral link
@@ -184,7 +135,7 @@ def build_referrals_text_and_kb(bot, user_id, username, full_name):
 
     points = get_points(user_id)
     refs_count = get_referrals_count(user_id)
-    refs = get_referrals_for_user(user_id)
+    refs, has_newer, has_older = get_referrals_page(user_id, page_cursor, direction)
 
     # display name
     name_part = (full_name or "").strip()
@@ -223,14 +174,25 @@ def build_referrals_text_and_kb(bot, user_id, username, full_name):
     if refs:
         lines.append("")
         lines.append("🕘 Oxirgi takliflar ro'yxati:")
-        for r_user_id, r_username, r_full_name, created_at in refs[:10]:
+        for r_user_id, r_username, r_full_name, created_at, _ in refs:
             r_name = (r_full_name or "").strip()
             if r_username:
                 r_name = f"{r_name} (@{r_username})" if r_name else f"@{r_username}"
             if not r_name:
                 r_name = f"ID: {r_user_id}"
             lines.append(f"• {r_name} — {created_at}")
-    else:
+
+        # sahifalash: har bosishda faqat bitta sahifa o'qiladi
+        nav = []
+        if has_newer:
+            nav.append(InlineKeyboardButton("⬅️ Oldingi", callback_data=_page_callback("prev", refs[0])))
+        if has_older:
+            nav.append(InlineKeyboardButton("Keyingi ➡️", callback_data=_page_callback("next", refs[-1])))
+        if nav:
+            if kb is None:
+                kb = InlineKeyboardMarkup(row_width=2)
+            kb.row(*nav)
+    elif page_cursor is None:
         lines.append("Hozircha takliflaringiz yo'q. Birinchi bo'lib do'stlaringizni taklif qiling 😊")
 
     return "\n".join(lines), kb
@@ -270,8 +232,6 @@ def process_start_referral(message) -> bool:
 # =========================
 
 def setup_referral_handlers(bot):
-    _init_pending_table()
-
     @bot.message_handler(func=lambda m: m.chat.type == "private" and m.text == "🤝 Takliflarim")
     def handle_referrals(message):
         user = message.from_user
@@ -283,6 +243,35 @@ def setup_referral_handlers(bot):
         )
         bot.send_message(message.chat.id, text, reply_markup=kb)
 
+    @bot.callback_query_handler(func=lambda c: c.data.startswith("ref_page|"))
+    def handle_ref_page(call):
+        parsed = parse_page_callback(call.data)
+        if not parsed:
+            bot.answer_callback_query(call.id)
+            return
+
+        direction, page_cursor = parsed
+        user = call.from_user
+        text, kb = build_referrals_text_and_kb(
+            bot,
+            user_id=user.id,
+            username=user.username,
+            full_name=(f"{user.first_name or ''} {user.last_name or ''}".strip()),
+            page_cursor=page_cursor,
+            direction=direction,
+        )
+        try:
+            bot.edit_message_text(
+                text,
+                call.message.chat.id,
+                call.message.message_id,
+                reply_markup=kb,
+            )
+        except Exception as e:
+            # "message is not modified" va h.k. - jim
+            print(f"Takliflar sahifasini yangilab bo'lmadi: {e}")
+        bot.answer_callback_query(call.id)
+
     @bot.callback_query_handler(func=lambda c: c.data == "ref_check_sub")
     def handle_ref_check(call):
         user_id = call.from_user.id
@@ -292,7 +281,8 @@ def setup_referral_handlers(bot):
             bot.answer_callback_query(call.id, "Pending bonus topilmadi.", show_alert=True)
             return
 
-        # 2) Obuna bo'lmagan bo'lsa
+        # 2) Obuna bo'lmagan bo'lsa (tugma bosildi - keshdagi "yo'q" eskirgan bo'lishi mumkin)
+        invalidate_subscription(user_id)
         if not check_subscription(bot, user_id):
             bot.answer_callback_query(
                 call.id,
@@ -1,18 +1,12 @@
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
 from config import CHANNEL_USERNAME, ADMINS
 from keyboards.default import main_menu_keyboard, admin_menu_keyboard
+from utils.subscription import is_subscribed, invalidate_subscription
 
 
-# 🔎 Obuna tekshirish funksiyasi
+# 🔎 Obuna tekshirish funksiyasi (keshlangan, utils/subscription.py)
 def check_subscription(bot, user_id):
-    try:
-        # @ belgisi olib tashlanadi
-        chat_id = CHANNEL_USERNAME.replace("@", "")
-        member = bot.get_chat_member(chat_id, user_id)
-        return member.status in ["member", "administrator", "creator"]
-    except Exception as e:
-        print(f"Obuna tekshirish xatosi: {e}")
-        return False
+    return is_subscribed(bot, user_id)
 
 
 # 📌 Obuna bo'lishni so'rash
@@ -45,6 +39,7 @@ def setup_subscription_callbacks(bot):
     @bot.callback_query_handler(func=lambda call: call.data == "check_sub")
     def check_sub_callback(call):
         try:
+            invalidate_subscription(call.from_user.id)
             if check_subscription(bot, call.from_user.id):
                 # Agar admin bo'lsa admin menyu
                 if call.from_user.id in ADMINS:
@@ -6,12 +6,14 @@ from database.database import (
     get_gift_likes_count,
     get_referrals_count,
 )
+from utils.leaderboard import get_user_rank, get_neighbours
 from handlers.users.top_users import format_top_users
-from utils.points import get_points, get_top_users
+from utils.points import get_points
 
 # ✅ safe yuborish (403/429 botni yiqitmasin)
 import time
 from utils.safe_telegram import safe_send_message, safe_send_photo
+from utils.media_cache import send_cached_photo
 
 
 # ✅ oddiy cooldown (user spam bosmasin)
@@ -37,14 +39,7 @@ def setup_user_text_handlers(bot):
         points = get_points(user_id)
         referrals_count = get_referrals_count(user_id)
 
-        rows = get_top_users(limit=1000)
-        rank = None
-        total_users = len(rows)
-
-        for idx, (u_id, u_username, u_full_name, u_points, u_refs) in enumerate(rows, start=1):
-            if u_id == user_id:
-                rank = idx
-                break
+        rank, total_users = get_user_rank(user_id)
 
         name_part = (full_name or "").strip()
         if username:
@@ -66,12 +61,26 @@ def setup_user_text_handlers(bot):
             else:
                 rank_text = "Hali umumiy reytingda ko‘rinadigan darajada ball yo‘q 🙂"
 
+        # atrofingizdagilar (reyting xotirada bo'lsa)
+        around_text = ""
+        neighbours = get_neighbours(user_id, around=2)
+        if len(neighbours) > 1:
+            lines = []
+            for n_rank, (n_id, n_username, n_full_name, n_points, _) in neighbours:
+                if n_id == user_id:
+                    lines.append(f"▶️ {n_rank}. Siz — {n_points} ball")
+                else:
+                    n_name = (n_full_name or "").strip() or (f"@{n_username}" if n_username else f"ID: {n_id}")
+                    lines.append(f"{n_rank}. {n_name} — {n_points} ball")
+            around_text = "👥 Atrofingizdagilar:\n" + "\n".join(lines) + "\n\n"
+
         text = (
             "📊 Sizning statistikangiz\n\n"
             f"👤 Foydalanuvchi: {name_part}\n"
             f"💰 Ballaringiz: {points}\n"
             f"🤝 Takliflaringiz soni: {referrals_count}\n"
             f"🏆 Reytingdagi holatingiz: {rank_text}\n\n"
+            f"{around_text}"
             "🎯 Ko‘proq quiz yeching, Tezkor so'zlar bajaring va do‘stlaringizni taklif qiling —\n"
             "ballaringiz tez o‘sadi! 🚀"
         )
@@ -138,8 +147,13 @@ def setup_user_text_handlers(bot):
         for text, image_path in announcements:
             if image_path:
                 try:
-                    with open(image_path, "rb") as img:
-                        safe_send_photo(bot, message.chat.id, img, caption=text)
+                    send_cached_photo(
+                        bot, message.chat.id, image_path,
+                        send=lambda photo, **kw: safe_send_photo(
+                            bot, message.chat.id, photo, return_bool=False, **kw
+                        ),
+                        caption=text,
+                    )
                 except FileNotFoundError:
                     safe_send_message(bot, message.chat.id, text)
             else:
@@ -1,7 +1,54 @@
+import threading
+import time
+
 from utils.points import get_top_users
+from utils.leaderboard import get_top_version
+
+# Tayyor matn keshi: top 10 o'zgarmaguncha qayta hisoblanmaydi.
+# Asosiy invalidatsiya - reytingdagi top_version; TTL esa zaxira.
+TOP_USERS_CACHE_TTL = 30  # sekund
+
+_cache = {"text": None, "version": None, "built_at": 0.0}
+_cache_lock = threading.Lock()
+_cache_metrics = {"hits": 0, "misses": 0}
+
+
+def _cache_valid(version: int) -> bool:
+    return (
+        _cache["text"] is not None
+        and _cache["version"] == version
+        and time.time() - _cache["built_at"] < TOP_USERS_CACHE_TTL
+    )
 
 
 def format_top_users() -> str:
+    """
+    Top 10 matni (keshdan). Bir vaqtda kelgan so'rovlar kesh bo'sh bo'lsa
+    ham faqat bittasi hisoblaydi, qolganlari shu natijani oladi.
+    """
+    version = get_top_version()
+    if _cache_valid(version):
+        _cache_metrics["hits"] += 1
+        return _cache["text"]
+
+    with _cache_lock:
+        # lockni kutib turganda boshqa thread hisoblab qo'ygan bo'lishi mumkin
+        version = get_top_version()
+        if _cache_valid(version):
+            _cache_metrics["hits"] += 1
+            return _cache["text"]
+
+        _cache_metrics["misses"] += 1
+        text = _render_top_users()
+        _cache.update(text=text, version=version, built_at=time.time())
+        return text
+
+
+def get_top_users_cache_metrics() -> dict:
+    return dict(_cache_metrics)
+
+
+def _render_top_users() -> str:
     """
     Top foydalanuvchilar ro'yxatini chiroyli matnga aylantiradi.
     get_top_users() -> (user_id, username, full_name, points, referrals_count)
@@ -1,8 +1,10 @@
 import telebot
 import os
+import signal
 import time
 
 from config import BOT_TOKEN
+from utils.safe_telegram import ReachabilityTeleBot
 
 from handlers.users.commands import setup_user_commands
 from handlers.users.text_handlers import setup_user_text_handlers
@@ -15,6 +17,15 @@ from handlers.admins.callbacks import setup_admin_callbacks
 from handlers.translate.handler import setup_translate_handlers
 
 from database.database import init_database
+from database.points_buffer import flush_points_buffer
+from database.ledger import flush_ledger
+from utils.leaderboard import load_leaderboard
+from utils.activity import setup_activity_middleware, load_recent_activity, flush_activity
+from utils.referral_sweeper import start_referral_sweeper
+from utils.broadcast import resume_broadcasts
+from utils.channel_members import (
+    setup_channel_member_handlers, load_channel_members, start_channel_reconcile
+)
 
 
 from utils.backup import start_auto_backup
@@ -26,13 +37,18 @@ from handlers.users.bonus import setup_bonus_handlers
 
 
 # ---------- BOT ----------
-bot = telebot.TeleBot(BOT_TOKEN, threaded=True, num_threads=4)
+# Middleware (oxirgi faollik) ishlashi uchun bot yaratilishidan oldin yoqiladi
+telebot.apihelper.ENABLE_MIDDLEWARE = True
+# 403 bilan tugagan har qanday yuborish users.reachable = 0 qiladi
+bot = ReachabilityTeleBot(BOT_TOKEN, threaded=True, num_threads=4)
 
 # Kerakli papkalar
 os.makedirs("images", exist_ok=True)
 os.makedirs("backups", exist_ok=True)
 
 # Handlerlarni sozlash
+setup_activity_middleware(bot)
+setup_channel_member_handlers(bot)
 setup_user_commands(bot)
 setup_user_text_handlers(bot)
 setup_user_callbacks(bot)
@@ -51,18 +67,54 @@ setup_bonus_handlers(bot)
 setup_backup_handlers(bot)
 
 
+def flush_buffers():
+    """Xotiradagi yozilmagan ma'lumotlar: ballar -> jurnal (ballar undan oldin), faollik."""
+    for flush in (flush_points_buffer, flush_ledger, flush_activity):
+        try:
+            flush()
+        except Exception as e:
+            print(f"⚠️ {flush.__name__} xatosi: {e}")
+
+
+def _on_stop_signal(signum, frame):
+    # SIGTERM (systemctl stop / deploy) da atexit ishlamaydi; SIGINT ni esa
+    # infinity_polling o'zi yutib, pastdagi while True qayta ishga tushiradi
+    print(f"🛑 Signal {signum}: bot to'xtatilmoqda...")
+    raise SystemExit(0)
+
+
 if __name__ == "__main__":
     init_database()
+    load_leaderboard()
+    load_recent_activity()
+    load_channel_members()
+    start_channel_reconcile(bot)
+    start_referral_sweeper(bot)
+    resume_broadcasts(bot)
 
     # Siz 24 qilgansiz - qoldirdim
     start_auto_backup(interval_hours=24)
 
+    signal.signal(signal.SIGTERM, _on_stop_signal)
+    signal.signal(signal.SIGINT, _on_stop_signal)
+
     print("🚀 Bot ishga tushdi...")
 
     # ✅ Bot yiqilib qolmasin: crash bo'lsa ham qayta turadi
-    while True:
-        try:
-            bot.infinity_polling(skip_pending=True, timeout=30, long_polling_timeout=30)
-        except Exception as e:
-            print(f"⚠️ Polling crash: {e}")
-            time.sleep(3)
+    try:
+        while True:
+            try:
+                bot.infinity_polling(
+                    skip_pending=True, timeout=30, long_polling_timeout=30,
+                    # chat_member standart holatda kelmaydi - kanal a'zoligi uchun kerak
+                    allowed_updates=[
+                        "message", "edited_message", "callback_query",
+                        "my_chat_member", "chat_member",
+                    ],
+                )
+            except Exception as e:
+                print(f"⚠️ Polling crash: {e}")
+                time.sleep(3)
+    finally:
+        flush_buffers()
+        print("✅ Buferlar yozildi")
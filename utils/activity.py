@@ -0,0 +1,158 @@
+"""
+Foydalanuvchilarning oxirgi faolligi (online statistika uchun).
+
+Middleware har bir update (xabar / callback) da touch() chaqiradi - bu faqat
+xotiradagi xaritani yangilaydi. Fon thread har ACTIVITY_FLUSH_SEC da o'zgargan
+yozuvlarni bitta tranzaksiyada users.last_active_ts ga yozadi (har xabarga
+alohida yozuv yo'q). "Online" soni to'g'ridan-to'g'ri xotiradan sanaladi.
+"""
+
+import atexit
+import threading
+import time
+
+from database.write_retry import WriteRetry
+
+# Sozlamalar
+ACTIVITY_FLUSH_SEC = 5           # DBga yozish oralig'i
+ACTIVITY_KEEP_SEC = 60 * 60      # xotirada shuncha vaqtgacha faollik saqlanadi
+
+_last_seen = {}      # user_id -> epoch (xotiradagi, online hisoblash uchun)
+_dirty = {}          # user_id -> epoch (hali DBga yozilmagan)
+_lock = threading.Lock()
+_flush_thread = None
+_retry = WriteRetry("activity")
+
+_metrics = {
+    "touches": 0,
+    "flushes": 0,
+    "rows_written": 0,
+    "last_flush_ms": 0.0,
+    "errors": 0,
+}
+
+
+def touch(user_id: int, ts: int | None = None):
+    """Userni hozir faol deb belgilaydi (faqat xotira)."""
+    if not user_id:
+        return
+    if ts is None:
+        ts = int(time.time())
+    with _lock:
+        _last_seen[user_id] = ts
+        _dirty[user_id] = ts
+        _metrics["touches"] += 1
+
+
+def count_online(window_min: int) -> int:
+    """Oxirgi window_min daqiqada faol bo'lgan userlar soni (xotiradan)."""
+    since = int(time.time()) - window_min * 60
+    with _lock:
+        return sum(1 for ts in _last_seen.values() if ts >= since)
+
+
+def _requeue(items: list):
+    # yangiroq qiymat bo'lmasa qaytarib qo'yamiz
+    with _lock:
+        for user_id, ts in items:
+            if _dirty.get(user_id, 0) < ts:
+                _dirty[user_id] = ts
+
+
+def flush_activity() -> int:
+    """O'zgargan yozuvlarni bitta tranzaksiyada yozadi. return: yozilganlar soni."""
+    from database.database import get_connection
+
+    with _lock:
+        if not _dirty:
+            return 0
+        batch = list(_dirty.items())
+        _dirty.clear()
+
+    started = time.perf_counter()
+    conn = get_connection()
+    try:
+        with conn:
+            conn.executemany(
+                "UPDATE users SET last_active_ts = ? WHERE user_id = ?",
+                [(ts, user_id) for user_id, ts in batch]
+            )
+            # user yozdi -> botni bloklamagan: reachable qayta yoqiladi (odatda 0 qator)
+            conn.executemany(
+                "UPDATE users SET reachable = 1, blocked_at = NULL WHERE user_id = ? AND reachable = 0",
+                [(user_id,) for user_id, _ in batch]
+            )
+    except Exception as e:
+        _metrics["errors"] += 1
+        print(f"[activity] yozishda xatolik ({len(batch)} ta): {e}")
+        _retry.failed(batch, key=lambda item: item[0], requeue=_requeue, error=e)
+        return 0
+    _retry.succeeded(user_id for user_id, _ in batch)
+
+    _metrics["flushes"] += 1
+    _metrics["rows_written"] += len(batch)
+    _metrics["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return len(batch)
+
+
+def _prune():
+    # eski faolliklar online sanashga kerak emas (DBda baribir saqlangan)
+    cutoff = int(time.time()) - ACTIVITY_KEEP_SEC
+    with _lock:
+        for user_id in [u for u, ts in _last_seen.items() if ts < cutoff]:
+            if user_id not in _dirty:
+                del _last_seen[user_id]
+
+
+def _flush_loop():
+    while True:
+        time.sleep(ACTIVITY_FLUSH_SEC)
+        flush_activity()
+        _prune()
+
+
+def load_recent_activity():
+    """
+    Qayta ishga tushganda oxirgi ACTIVITY_KEEP_SEC dagi faollikni DBdan oladi
+    (aks holda online soni birinchi daqiqalarda 0 ko'rinadi) va fon threadni ishga tushiradi.
+    """
+    global _flush_thread
+    from database.database import get_connection
+
+    since = int(time.time()) - ACTIVITY_KEEP_SEC
+    rows = get_connection().execute(
+        "SELECT user_id, last_active_ts FROM users WHERE last_active_ts >= ?", (since,)
+    ).fetchall()
+    with _lock:
+        for user_id, ts in rows:
+            if _last_seen.get(user_id, 0) < ts:
+                _last_seen[user_id] = ts
+
+    if _flush_thread is None:
+        _flush_thread = threading.Thread(target=_flush_loop, name="activity-flush", daemon=True)
+        _flush_thread.start()
+
+
+atexit.register(flush_activity)
+
+
+def get_activity_metrics() -> dict:
+    m = dict(_metrics)
+    with _lock:
+        m["tracked"] = len(_last_seen)
+        m["pending"] = len(_dirty)
+    m["dropped"] = _retry.dropped
+    return m
+
+
+def setup_activity_middleware(bot):
+    """
+    Har bir xabar va callback da faollikni belgilaydi.
+    main.py da TeleBot yaratilishidan oldin apihelper.ENABLE_MIDDLEWARE = True bo'lishi kerak.
+    """
+
+    @bot.middleware_handler(update_types=["message", "callback_query"])
+    def _track_activity(bot_instance, update):
+        user = getattr(update, "from_user", None)
+        if user is not None:
+            touch(user.id)
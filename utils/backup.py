@@ -3,8 +3,10 @@ import time
 import threading
 import zipfile
 import datetime
+import tempfile
 
 from config import DATABASE_PATH
+from database.database import backup_to_file
 
 # Backuplar saqlanadigan papka
 BACKUP_DIR = "backups"
@@ -41,8 +43,15 @@ def create_backup() -> str:
             # 1) Database
             if os.path.exists(DATABASE_PATH):
                 # Zip ichida chiroyli ko'rinishi uchun "db/" ichiga joylaymiz
+                # WAL rejimida faylni to'g'ridan-to'g'ri olib bo'lmaydi -> izchil snapshot
                 arcname = os.path.join("db", os.path.basename(DATABASE_PATH))
-                zf.write(DATABASE_PATH, arcname=arcname)
+                fd, snapshot = tempfile.mkstemp(suffix=".db")
+                os.close(fd)
+                try:
+                    backup_to_file(snapshot)
+                    zf.write(snapshot, arcname=arcname)
+                finally:
+                    os.remove(snapshot)
             else:
                 print(f"[BACKUP] Ogohlantirish: DATABASE_PATH topilmadi: {DATABASE_PATH}")
 
@@ -0,0 +1,337 @@
+"""
+E'lonni barcha foydalanuvchilarga tarqatish (📢 E'lon yuborish).
+
+Ish (broadcast_jobs) va har bir qabul qiluvchi (broadcast_deliveries) DBda
+saqlanadi. Fon thread pending yetkazishlarni partiyalab oladi va
+cheklangan pool (BROADCAST_WORKERS) orqali token bucket (BROADCAST_RATE/s)
+tezligida yuboradi. 429 bo'lsa retry_after davomida barcha workerlar kutadi.
+Partiya ~BROADCAST_PROGRESS_SEC lik yuborish hajmida: natijalar har partiyadan
+keyin bitta tranzaksiyada yoziladi va admin xabari yangilanadi. Bot qayta ishga
+tushsa resume_broadcasts() qolgan joyidan davom ettiradi (yozilmay qolgan
+oxirgi partiya - ko'pi bilan BROADCAST_BATCH ta user - qayta yuborilishi mumkin).
+
+Ish xatoga uchrasa (DB va h.k.) BROADCAST_RUN_ATTEMPTS marta qayta boshlanadi,
+bo'lmasa 'failed' deb belgilanadi va adminga xabar beriladi.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot.apihelper import ApiTelegramException
+
+from database.database import get_connection, iter_reachable_user_ids
+from utils.rate_limit import TokenBucket
+from utils.safe_telegram import extract_retry_after
+from utils.media_cache import send_cached_photo
+
+# Sozlamalar
+BROADCAST_RATE = 28            # xabar / sekund (Telegram chegarasi ~30)
+BROADCAST_WORKERS = 8          # bir vaqtda ketayotgan so'rovlar
+BROADCAST_PROGRESS_SEC = 3     # admin xabarini yangilash / natijalarni yozish oralig'i
+# DBdan bir martada olinadigan qabul qiluvchilar (~BROADCAST_PROGRESS_SEC lik ish)
+BROADCAST_BATCH = BROADCAST_RATE * BROADCAST_PROGRESS_SEC
+BROADCAST_MAX_ATTEMPTS = 3     # 429 / tarmoq xatosida qayta urinishlar
+BROADCAST_RUN_ATTEMPTS = 3     # ish xatoga uchrasa qayta boshlash
+BROADCAST_RUN_RETRY_SEC = 10   # qayta boshlashdan oldin kutish (x urinish raqami)
+
+# broadcast_deliveries.status
+PENDING, SENT, BLOCKED, FAILED = 0, 1, 2, 3
+
+# Butun bot uchun bitta: bir nechta e'lon bir vaqtda ketsa ham jami tezlik oshmaydi
+_bucket = TokenBucket(BROADCAST_RATE)
+_pause_until = 0.0             # 429 dan keyin hamma shu vaqtgacha kutadi
+_pause_lock = threading.Lock()
+
+_running = set()               # hozir ishlayotgan job_id lar
+_running_lock = threading.Lock()
+
+
+# ----------- DB -----------
+
+def create_broadcast(admin_chat_id: int, status_message_id: int | None,
+                     text: str | None, image_path: str | None = None,
+                     photo_file_id: str | None = None) -> int:
+    """Ish + barcha userlar uchun pending yetkazish (bitta tranzaksiya). return: job_id."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        with conn:
+            cursor.execute('''
+                INSERT INTO broadcast_jobs
+                    (admin_chat_id, status_message_id, text, image_path, photo_file_id, created_ts)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (admin_chat_id, status_message_id, text, image_path, photo_file_id, int(time.time())))
+            job_id = cursor.lastrowid
+
+            # botni bloklaganlar (reachable = 0) qo'shilmaydi; partiyalab yoziladi
+            total = 0
+            batch = []
+            for user_id in iter_reachable_user_ids(BROADCAST_BATCH):
+                batch.append((job_id, user_id))
+                if len(batch) >= BROADCAST_BATCH:
+                    cursor.executemany(
+                        "INSERT INTO broadcast_deliveries (job_id, user_id) VALUES (?, ?)", batch
+                    )
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(
+                    "INSERT INTO broadcast_deliveries (job_id, user_id) VALUES (?, ?)", batch
+                )
+                total += len(batch)
+            cursor.execute(
+                "UPDATE broadcast_jobs SET total = ? WHERE id = ?", (total, job_id)
+            )
+    finally:
+        cursor.close()
+    return job_id
+
+
+def get_broadcast(job_id: int) -> dict | None:
+    row = get_connection().execute('''
+        SELECT id, admin_chat_id, status_message_id, text, image_path, photo_file_id,
+               status, total, sent, blocked, failed, created_ts, finished_ts
+        FROM broadcast_jobs WHERE id = ?
+    ''', (job_id,)).fetchone()
+    if row is None:
+        return None
+    keys = ("id", "admin_chat_id", "status_message_id", "text", "image_path", "photo_file_id",
+            "status", "total", "sent", "blocked", "failed", "created_ts", "finished_ts")
+    return dict(zip(keys, row))
+
+
+def _pending_batch(job_id: int, after_user_id: int) -> list:
+    rows = get_connection().execute('''
+        SELECT user_id FROM broadcast_deliveries
+        WHERE job_id = ? AND status = 0 AND user_id > ?
+        ORDER BY user_id
+        LIMIT ?
+    ''', (job_id, after_user_id, BROADCAST_BATCH)).fetchall()
+    return [r[0] for r in rows]
+
+
+def _save_results(job_id: int, results: list):
+    """results: [(user_id, status, error), ...] -> bitta tranzaksiya."""
+    counts = {SENT: 0, BLOCKED: 0, FAILED: 0}
+    for _, status, _ in results:
+        counts[status] += 1
+
+    conn = get_connection()
+    with conn:
+        conn.executemany(
+            "UPDATE broadcast_deliveries SET status = ?, error = ? WHERE job_id = ? AND user_id = ?",
+            [(status, error, job_id, user_id) for user_id, status, error in results]
+        )
+        conn.execute('''
+            UPDATE broadcast_jobs
+            SET sent = sent + ?, blocked = blocked + ?, failed = failed + ?
+            WHERE id = ?
+        ''', (counts[SENT], counts[BLOCKED], counts[FAILED], job_id))
+
+
+def _finish_job(job_id: int, status: str = "done"):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "UPDATE broadcast_jobs SET status = ?, finished_ts = ? WHERE id = ?",
+            (status, int(time.time()), job_id)
+        )
+
+
+# ----------- Yuborish -----------
+
+def _wait_pause():
+    while True:
+        delay = _pause_until - time.monotonic()
+        if delay <= 0:
+            return
+        time.sleep(delay)
+
+
+def _pause(seconds: float):
+    global _pause_until
+    with _pause_lock:
+        _pause_until = max(_pause_until, time.monotonic() + seconds)
+
+
+def _classify(exc: Exception):
+    """return: (status | None, retry_after). None -> qayta urinish mumkin."""
+    if isinstance(exc, ApiTelegramException):
+        s = str(exc)
+        if "429" in s or "Too Many Requests" in s:
+            return None, extract_retry_after(exc) + 1
+        if "403" in s or "Forbidden" in s or "blocked by the user" in s:
+            return BLOCKED, 0
+        # 400 (chat not found, ...) - qayta urinishdan foyda yo'q
+        return FAILED, 0
+    return None, 1
+
+
+def _send_one(bot, job: dict, user_id: int):
+    """return: (user_id, status, error)"""
+    error = None
+    for _ in range(BROADCAST_MAX_ATTEMPTS):
+        _wait_pause()
+        _bucket.acquire()
+        try:
+            if job["photo_file_id"]:
+                bot.send_photo(user_id, job["photo_file_id"], caption=job["text"])
+            elif job["image_path"]:
+                # file_id yo'q (eski ish) - bir marta yuklanadi, keyin file_id bilan
+                send_cached_photo(bot, user_id, job["image_path"], caption=job["text"])
+            else:
+                bot.send_message(user_id, job["text"])
+            return user_id, SENT, None
+        except Exception as e:
+            error = str(e)[:200]
+            status, retry_after = _classify(e)
+            if status is not None:
+                return user_id, status, error
+            if retry_after > 1:
+                _pause(retry_after)
+            else:
+                time.sleep(retry_after)
+    return user_id, FAILED, error
+
+
+def _done(job: dict) -> int:
+    return job["sent"] + job["blocked"] + job["failed"]
+
+
+def _progress_text(job: dict, elapsed: float, done_before: int = 0) -> str:
+    # tezlik faqat shu ishga tushishda yuborilganlar bo'yicha (davom ettirilganda ham to'g'ri)
+    done = _done(job)
+    total = job["total"] or 1
+    rate = round((done - done_before) / elapsed, 1) if elapsed > 0 else 0
+    return (
+        f"📢 E'lon yuborilmoqda: {done}/{job['total']} ({done * 100 // total}%)\n"
+        f"✅ {job['sent']} | 🚫 {job['blocked']} | ❌ {job['failed']}\n"
+        f"⚡ {rate} ta/s"
+    )
+
+
+def _report_text(job: dict, elapsed: float, done_before: int = 0) -> str:
+    rate = round((_done(job) - done_before) / elapsed, 1) if elapsed > 0 else 0
+    return (
+        "✅ E'lon yuborish tugadi!\n\n"
+        f"👥 Jami: {job['total']}\n"
+        f"✅ Yetkazildi: {job['sent']}\n"
+        f"🚫 Bloklagan: {job['blocked']}\n"
+        f"❌ Xatolik: {job['failed']}\n"
+        f"⏱ Vaqt: {round(elapsed, 1)} s ({rate} ta/s)"
+    )
+
+
+def _edit_status(bot, job: dict, text: str):
+    # yuborishlar bilan bir xil limit: bucket + 429 dagi umumiy pauza;
+    # "message is not modified" va h.k. - tarqatishni to'xtatmaydi
+    if not job["status_message_id"]:
+        return
+    _wait_pause()
+    _bucket.acquire()
+    try:
+        bot.edit_message_text(text, job["admin_chat_id"], job["status_message_id"])
+    except Exception as e:
+        status, retry_after = _classify(e)
+        if status is None and retry_after > 1:
+            _pause(retry_after)
+        print(f"[broadcast] progress xabarini yangilab bo'lmadi: {e}")
+
+
+def _send_report(bot, job: dict, report: str):
+    _edit_status(bot, job, report)
+    try:
+        bot.send_message(job["admin_chat_id"], report)
+    except Exception as e:
+        print(f"[broadcast] hisobotni yuborib bo'lmadi: {e}")
+    print(f"[broadcast] #{job['id']}: " + report.replace("\n", " "))
+
+
+def _run_once(bot, job_id: int, started: float, done_before: int):
+    job = get_broadcast(job_id)
+    last_progress = 0.0
+    last_user_id = 0
+    with ThreadPoolExecutor(max_workers=BROADCAST_WORKERS, thread_name_prefix="broadcast") as pool:
+        while True:
+            batch = _pending_batch(job_id, last_user_id)
+            if not batch:
+                break
+            last_user_id = batch[-1]
+
+            results = list(pool.map(lambda uid: _send_one(bot, job, uid), batch))
+            _save_results(job_id, results)
+
+            now = time.perf_counter()
+            if now - last_progress >= BROADCAST_PROGRESS_SEC:
+                last_progress = now
+                current = get_broadcast(job_id)
+                _edit_status(bot, current, _progress_text(current, now - started, done_before))
+
+    _finish_job(job_id)
+    job = get_broadcast(job_id)
+    _send_report(bot, job, _report_text(job, time.perf_counter() - started, done_before))
+
+
+def _fail_job(bot, job_id: int, error: Exception):
+    try:
+        _finish_job(job_id, "failed")
+        job = get_broadcast(job_id)
+        _send_report(bot, job, (
+            "❌ E'lon yuborish to'xtadi!\n\n"
+            f"👥 Jami: {job['total']}\n"
+            f"✅ Yetkazildi: {job['sent']}\n"
+            f"🚫 Bloklagan: {job['blocked']}\n"
+            f"❌ Xatolik: {job['failed']}\n"
+            f"⏳ Yuborilmadi: {job['total'] - _done(job)}\n"
+            f"⚠️ Sabab: {str(error)[:200]}"
+        ))
+    except Exception as e:
+        print(f"[broadcast] #{job_id} ni 'failed' deb belgilab bo'lmadi: {e}")
+
+
+def _run(bot, job_id: int):
+    started = time.perf_counter()
+    try:
+        job = get_broadcast(job_id)
+        if job is None:
+            return
+        done_before = _done(job)
+
+        error = None
+        for attempt in range(1, BROADCAST_RUN_ATTEMPTS + 1):
+            try:
+                _run_once(bot, job_id, started, done_before)
+                return
+            except Exception as e:
+                error = e
+                print(f"[broadcast] #{job_id} xatolik ({attempt}/{BROADCAST_RUN_ATTEMPTS}): {e}")
+                if attempt < BROADCAST_RUN_ATTEMPTS:
+                    time.sleep(BROADCAST_RUN_RETRY_SEC * attempt)
+        _fail_job(bot, job_id, error)
+    except Exception as e:
+        print(f"[broadcast] #{job_id} xatolik: {e}")
+    finally:
+        with _running_lock:
+            _running.discard(job_id)
+
+
+def start_broadcast(bot, job_id: int) -> bool:
+    """Ishni fon threadda boshlaydi (allaqachon ketayotgan bo'lsa - yo'q)."""
+    with _running_lock:
+        if job_id in _running:
+            return False
+        _running.add(job_id)
+    threading.Thread(target=_run, args=(bot, job_id), name=f"broadcast-{job_id}", daemon=True).start()
+    return True
+
+
+def resume_broadcasts(bot) -> int:
+    """Ishga tushganda: tugallanmagan ishlarni davom ettiradi. return: ishlar soni."""
+    rows = get_connection().execute(
+        "SELECT id FROM broadcast_jobs WHERE status = 'running' ORDER BY id"
+    ).fetchall()
+    for (job_id,) in rows:
+        print(f"[broadcast] #{job_id} davom ettirilmoqda")
+        start_broadcast(bot, job_id)
+    return len(rows)
@@ -0,0 +1,246 @@
+"""
+Kanal a'zoligi (CHANNEL_USERNAME) - chat_member update'lari asosida.
+
+Bot kanalda admin bo'lgani uchun Telegram har bir qo'shilish/chiqishni
+chat_member update sifatida yuboradi (main.py da allowed_updates ga
+"chat_member" qo'shilgan). Holat channel_members jadvaliga va xotiradagi
+xaritaga yoziladi - utils/subscription.is_subscribed uni O(1) o'qiydi va
+holat ma'lum bo'lsa Bot API ga murojaat qilmaydi.
+
+Bot o'chiq paytdagi update'lar skip_pending bilan tashlanadi - holat eskirgan
+bo'lishi mumkin. Shuning uchun "✅ Tekshirish" bosilganda userning saqlangan
+holati (a'zo ham, emas ham) unutiladi va keyingi tekshiruv API dan so'raydi.
+
+Kuzatish boshlanishidan oldingi userlar uchun fonda bosqichma-bosqich
+solishtirish: holati noma'lum (qatori yo'q yoki status yozilmagan) userlar
+get_chat_member bilan (token bucket orqali) tekshiriladi. Qaysi user_id gacha
+o'tilgani channel_reconcile jadvaliga yoziladi - ish to'xtasa keyingi ishga
+tushishda davom etadi, tugagach qayta yurmaydi.
+"""
+
+import threading
+import time
+
+from config import CHANNEL_USERNAME
+from utils.rate_limit import TokenBucket
+
+# Sozlamalar
+RECONCILE_RATE = 10          # get_chat_member / sekund
+RECONCILE_BATCH = 500
+
+MEMBER_STATUSES = ("member", "administrator", "creator")
+
+_status = {}          # user_id -> bool (jadvaldagi holat nusxasi)
+_lock = threading.Lock()
+_reconcile_thread = None
+
+_metrics = {
+    "loaded": 0,
+    "events": 0,
+    "joined": 0,
+    "left": 0,
+    "reconciled": 0,
+    "reconcile_api_calls": 0,
+    "reconcile_done": False,
+}
+
+
+def _channel_username() -> str:
+    return CHANNEL_USERNAME.lstrip("@").lower()
+
+
+def get_channel_status(user_id: int):
+    """return: True / False (ma'lum) yoki None (noma'lum - API dan so'rash kerak)."""
+    return _status.get(user_id)
+
+
+def record_channel_status(user_id: int, is_member: bool, status: str | None = None):
+    """Holatni jadvalga va xotiraga yozadi."""
+    from database.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            '''
+            INSERT INTO channel_members (user_id, is_member, status, updated_ts)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                is_member = excluded.is_member,
+                status = excluded.status,
+                updated_ts = excluded.updated_ts
+            ''',
+            (user_id, int(bool(is_member)), status, int(time.time()))
+        )
+    with _lock:
+        _status[user_id] = bool(is_member)
+
+
+def forget_channel_status(user_id: int):
+    """
+    "✅ Tekshirish" bosilganda: saqlangan holat (a'zo ham, emas ham) eskirgan
+    bo'lishi mumkin -> noma'lum qilamiz, keyingi tekshiruv API dan so'raydi.
+    """
+    with _lock:
+        _status.pop(user_id, None)
+
+
+def load_channel_members():
+    """Ishga tushganda jadvalni xotiraga yuklaydi (init_database dan keyin)."""
+    from database.database import get_connection
+
+    # status NULL - hech qachon tekshirilmagan, noma'lum hisoblanadi
+    rows = get_connection().execute(
+        "SELECT user_id, is_member FROM channel_members WHERE status IS NOT NULL"
+    ).fetchall()
+    with _lock:
+        _status.clear()
+        for user_id, is_member in rows:
+            _status[user_id] = bool(is_member)
+    _metrics["loaded"] = len(rows)
+
+
+# ----------- Fondagi solishtirish -----------
+
+def _get_reconcile_cursor():
+    """return: (last_user_id, done)."""
+    from database.database import get_connection
+
+    row = get_connection().execute(
+        "SELECT last_user_id, done FROM channel_reconcile WHERE id = 1"
+    ).fetchone()
+    return (row[0], bool(row[1])) if row else (0, False)
+
+
+def _save_reconcile_cursor(last_user_id: int, done: bool = False):
+    from database.database import get_connection
+
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            '''
+            INSERT INTO channel_reconcile (id, last_user_id, done, updated_ts)
+            VALUES (1, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                last_user_id = excluded.last_user_id,
+                done = excluded.done,
+                updated_ts = excluded.updated_ts
+            ''',
+            (last_user_id, int(done), int(time.time()))
+        )
+
+
+def _unknown_users_batch(after_user_id: int) -> list:
+    from database.database import get_connection
+
+    rows = get_connection().execute(
+        '''
+        SELECT u.user_id FROM users u
+        LEFT JOIN channel_members cm ON cm.user_id = u.user_id
+        WHERE u.user_id > ? AND (cm.user_id IS NULL OR cm.status IS NULL)
+        ORDER BY u.user_id
+        LIMIT ?
+        ''',
+        (after_user_id, RECONCILE_BATCH)
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def reconcile_channel_members(bot) -> int:
+    """
+    Holati noma'lum userlarni API bilan tekshirib yozadi, saqlangan joydan davom
+    etadi (tugagan bo'lsa hech narsa qilmaydi). return: yozilganlar soni.
+    """
+    last_id, done = _get_reconcile_cursor()
+    if done:
+        _metrics["reconcile_done"] = True
+        return 0
+
+    bucket = TokenBucket(RECONCILE_RATE)
+    chat_id = f"@{_channel_username()}"
+    written = 0
+
+    while True:
+        batch = _unknown_users_batch(last_id)
+        if not batch:
+            break
+
+        for user_id in batch:
+            if get_channel_status(user_id) is not None:
+                continue   # shu orada update kelgan
+            bucket.acquire()
+            _metrics["reconcile_api_calls"] += 1
+            try:
+                member = bot.get_chat_member(chat_id, user_id)
+            except Exception as e:
+                # user botni bloklagan / topilmadi va h.k. - keyingi safar qayta urinamiz
+                print(f"[channel] {user_id} tekshirib bo'lmadi: {e}")
+                continue
+            record_channel_status(user_id, member.status in MEMBER_STATUSES, member.status)
+            written += 1
+            _metrics["reconciled"] += 1
+
+        last_id = batch[-1]
+        _save_reconcile_cursor(last_id)
+
+    _save_reconcile_cursor(last_id, done=True)
+    _metrics["reconcile_done"] = True
+    return written
+
+
+def _reconcile_job(bot):
+    started = time.perf_counter()
+    try:
+        written = reconcile_channel_members(bot)
+        if written:
+            print(f"[channel] a'zolik solishtirildi: {written} ta user "
+                  f"({round(time.perf_counter() - started, 1)} s)")
+    except Exception as e:
+        print(f"[channel] solishtirish xatosi: {e}")
+
+
+def start_channel_reconcile(bot):
+    """
+    Fonda: noma'lum userlar qolmaguncha ishlaydi (main.py dan va restore dan
+    keyin; oldingisi hali ishlayotgan bo'lsa yangisi boshlanmaydi).
+    """
+    global _reconcile_thread
+    if _reconcile_thread is None or not _reconcile_thread.is_alive():
+        _reconcile_thread = threading.Thread(
+            target=_reconcile_job, args=(bot,), name="channel-reconcile", daemon=True
+        )
+        _reconcile_thread.start()
+
+
+def get_channel_metrics() -> dict:
+    m = dict(_metrics)
+    with _lock:
+        m["known"] = len(_status)
+        m["members"] = sum(1 for v in _status.values() if v)
+    return m
+
+
+# ----------- chat_member update'lari -----------
+
+def setup_channel_member_handlers(bot):
+    """Kanalga qo'shilish/chiqish. Bot kanalda admin bo'lishi shart."""
+
+    @bot.chat_member_handler(func=lambda u: (u.chat.username or "").lower() == _channel_username())
+    def _on_channel_member(update):
+        user_id = update.new_chat_member.user.id
+        status = update.new_chat_member.status
+        is_member = status in MEMBER_STATUSES
+        was_member = get_channel_status(user_id)
+
+        record_channel_status(user_id, is_member, status)
+        _metrics["events"] += 1
+
+        if is_member and not was_member:
+            _metrics["joined"] += 1
+            # havola bilan kelgan bo'lsa bonus shu zahoti (tugma bosishni kutmasdan)
+            try:
+                from handlers.users.referrals import try_activate_pending_referral
+                try_activate_pending_referral(bot, user_id, bonus_points=200)
+            except Exception as e:
+                print(f"[channel] referral faollashtirish xatosi: {e}")
+        elif not is_member and was_member:
+            _metrics["left"] += 1
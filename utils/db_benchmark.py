@@ -0,0 +1,155 @@
+"""
+Ulanish menejeri uchun micro-benchmark.
+
+Ishga tushirish (loyiha ildizidan):
+    python -m utils.db_benchmark
+    python -m utils.db_benchmark --ops 5000 --threads 4
+
+Vaqtinchalik bazada ikki usulni solishtiradi:
+  - "oldin": har bir so'rovda sqlite3.connect() + close() (eski create_connection)
+  - "keyin": thread-local doimiy ulanish (WAL, synchronous=NORMAL, statement cache)
+  - "bufer": quiz/tezkor so'zlar yo'li (write-behind, guruh bilan commit)
+
+Asl optimum.db ga tegmaydi.
+"""
+
+import os
+import sqlite3
+import argparse
+import tempfile
+import threading
+import time
+
+import database.database as db
+from database.migrations import run_migrations
+from database.points_buffer import buffer_points, flush_points_buffer, get_points_buffer_metrics
+
+
+def _prepare(path: str, users: int, migrate: bool):
+    """migrate=False: eski sxema (points REAL), migrate=True: joriy sxema."""
+    conn = sqlite3.connect(path)
+    if migrate:
+        run_migrations(conn)
+    else:
+        conn.execute('''
+            CREATE TABLE users (
+                user_id INTEGER PRIMARY KEY,
+                username TEXT,
+                full_name TEXT,
+                points REAL DEFAULT 0,
+                referrals_count INTEGER DEFAULT 0,
+                joined_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+    conn.executemany(
+        "INSERT INTO users (user_id, username, full_name) VALUES (?, ?, ?)",
+        [(i, f"user{i}", f"User {i}") for i in range(1, users + 1)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def _old_add_points(path: str, user_id: int, amount: float):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute('''
+        UPDATE users
+        SET points = ROUND(COALESCE(points, 0) + ?, 1)
+        WHERE user_id = ?
+    ''', (amount, user_id))
+    conn.commit()
+    conn.close()
+
+
+def _old_get_points(path: str, user_id: int):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(points, 0) FROM users WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return row
+
+
+def _run(label: str, worker, ops: int, threads: int) -> float:
+    per_thread = max(1, ops // threads)
+    errors = []
+
+    def target(tid: int):
+        try:
+            for i in range(per_thread):
+                worker(tid, i)
+        except Exception as e:
+            errors.append(e)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=target, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    total = per_thread * threads
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"{label:<32} {total:>7} ops  {elapsed:7.3f} s  {rate:10.0f} ops/s  xatolar: {len(errors)}")
+    if errors:
+        print(f"   birinchi xato: {errors[0]}")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite ulanish menejeri benchmarki")
+    parser.add_argument("--ops", type=int, default=2000, help="har bir stsenariy uchun jami amallar")
+    parser.add_argument("--threads", type=int, default=4, help="worker threadlar soni (TeleBot: 4)")
+    parser.add_argument("--users", type=int, default=1000, help="test bazadagi userlar soni")
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp(prefix="optimum_bench_")
+    old_path = os.path.join(tmp_dir, "old.db")
+    new_path = os.path.join(tmp_dir, "new.db")
+    _prepare(old_path, args.users, migrate=False)
+    _prepare(new_path, args.users, migrate=True)
+
+    def old_write(tid, i):
+        _old_add_points(old_path, (tid * 7919 + i) % args.users + 1, 1.0)
+
+    def old_read(tid, i):
+        _old_get_points(old_path, (tid * 7919 + i) % args.users + 1)
+
+    # Yangi menejer vaqtinchalik bazaga yo'naltiriladi
+    db.DATABASE_PATH = new_path
+    db.reset_connections()
+
+    def new_write(tid, i):
+        db.add_points((tid * 7919 + i) % args.users + 1, 1.0)
+
+    def buffered_write(tid, i):
+        buffer_points((tid * 7919 + i) % args.users + 1, 1.0, "quiz")
+
+    def new_read(tid, i):
+        db.get_points((tid * 7919 + i) % args.users + 1)
+
+    print(f"Baza: {tmp_dir} | threads={args.threads} | users={args.users}\n")
+
+    w_old = _run("oldin: add_points (connect/close)", old_write, args.ops, args.threads)
+    w_new = _run("keyin: add_points (pooled WAL)", new_write, args.ops, args.threads)
+    w_buf = _run("bufer: add_points_buffered", buffered_write, args.ops, args.threads)
+    flush_points_buffer()
+    r_old = _run("oldin: get_points (connect/close)", old_read, args.ops, args.threads)
+    r_new = _run("keyin: get_points (pooled WAL)", new_read, args.ops, args.threads)
+
+    print()
+    if w_old:
+        print(f"Yozish tezlashishi: x{w_new / w_old:.1f} (bufer bilan: x{w_buf / w_old:.1f})")
+    if r_old:
+        print(f"O'qish tezlashishi: x{r_new / r_old:.1f}")
+
+    m = get_points_buffer_metrics()
+    print(
+        f"Bufer: {m['events_flushed']} hodisa / {m['commits']} commit, "
+        f"oxirgi flush {m['last_flush_ms']} ms, eng uzoq {m['max_flush_ms']} ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
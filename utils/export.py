@@ -0,0 +1,164 @@
+"""
+Foydalanuvchilar eksporti (🎓 Students): CSV.gz yoki XLSX.
+
+Qatorlar DBdan partiyalab o'qiladi (iter_users_with_stats) va darhol
+SpooledTemporaryFile ga yoziladi - butun ro'yxat ham, butun fayl matni ham
+xotirada yig'ilmaydi (kichik fayl xotirada qoladi, kattasi diskka tushadi).
+
+XLSX uchun tashqi kutubxona kerak emas: zipfile + oddiy sheet XML (inlineStr).
+"""
+
+import csv
+import gzip
+import io
+import re
+import time
+import zipfile
+import tempfile
+from xml.sax.saxutils import escape
+
+from database.database import iter_users_with_stats, get_users_total
+
+# Sozlamalar
+EXPORT_BATCH = 1000                    # DBdan bir martada o'qiladigan qatorlar
+EXPORT_SPOOL_MAX = 8 * 1024 * 1024     # shundan katta fayl diskka tushadi
+EXPORT_PROGRESS_SEC = 2                # progress xabari oralig'i
+
+EXPORT_FORMATS = {
+    "csv": "users.csv.gz",
+    "xlsx": "users.xlsx",
+}
+
+EXPORT_HEADERS = ['User ID', 'Ism Familiya', 'Username', "Ro'yxatdan o'tgan vaqt", 'Ball', 'Takliflar soni']
+
+# XML 1.0 da ruxsat etilmagan boshqaruv belgilari (ismlarda uchrab turadi)
+_XML_BAD_CHARS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _export_rows():
+    for user_id, username, full_name, joined_at, points, refs in iter_users_with_stats(EXPORT_BATCH):
+        yield [
+            user_id,
+            full_name or "",
+            username or "",
+            joined_at or "",
+            points or 0,
+            refs or 0
+        ]
+
+
+def _write_csv_gz(fileobj, rows, on_row):
+    with gzip.GzipFile(filename="users.csv", mode="wb", fileobj=fileobj) as gz:
+        text = io.TextIOWrapper(gz, encoding="utf-8-sig", newline="")
+        writer = csv.writer(text)
+        writer.writerow(EXPORT_HEADERS)
+        for row in rows:
+            writer.writerow(row)
+            on_row()
+        text.flush()
+        text.detach()
+
+
+# ----------- XLSX (minimal) -----------
+
+_XLSX_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>'''
+
+_XLSX_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_XLSX_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="Users" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+_XLSX_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>'''
+
+_XLSX_SHEET_HEAD = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    '<sheetData>')
+_XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _xlsx_cell(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    text = escape(_XML_BAD_CHARS.sub("", str(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(values) -> str:
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+def _write_xlsx(fileobj, rows, on_row):
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _XLSX_CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _XLSX_RELS)
+        zf.writestr("xl/workbook.xml", _XLSX_WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _XLSX_WORKBOOK_RELS)
+
+        # sheet oqim bilan yoziladi (zf.open(..., "w")), 2 GB dan oshsa ham ishlaydi
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as raw:
+            sheet = io.TextIOWrapper(raw, encoding="utf-8")
+            sheet.write(_XLSX_SHEET_HEAD)
+            sheet.write(_xlsx_row(EXPORT_HEADERS))
+            for row in rows:
+                sheet.write(_xlsx_row(row))
+                on_row()
+            sheet.write(_XLSX_SHEET_TAIL)
+            sheet.flush()
+            sheet.detach()
+
+
+_WRITERS = {
+    "csv": _write_csv_gz,
+    "xlsx": _write_xlsx,
+}
+
+
+def export_users(fmt: str, progress=None):
+    """
+    Foydalanuvchilarni fmt ("csv" | "xlsx") formatida eksport qiladi.
+    progress(done, total) - har EXPORT_PROGRESS_SEC da chaqiriladi (ixtiyoriy).
+    return: (fileobj, file_name, rows, elapsed_sec) - fileobj boshiga qaytarilgan,
+    uni yopish chaqiruvchining ishi.
+    """
+    if fmt not in _WRITERS:
+        raise ValueError(f"Noma'lum format: {fmt}")
+
+    started = time.perf_counter()
+    total = get_users_total()
+    state = {"done": 0, "last": started}
+
+    def on_row():
+        state["done"] += 1
+        if progress is None or state["done"] % EXPORT_BATCH:
+            return
+        now = time.perf_counter()
+        if now - state["last"] >= EXPORT_PROGRESS_SEC:
+            state["last"] = now
+            try:
+                progress(state["done"], total)
+            except Exception as e:
+                print(f"[export] progress xatosi: {e}")
+
+    fileobj = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX)
+    try:
+        _WRITERS[fmt](fileobj, _export_rows(), on_row)
+        fileobj.seek(0)
+    except Exception:
+        fileobj.close()
+        raise
+
+    return fileobj, EXPORT_FORMATS[fmt], state["done"], round(time.perf_counter() - started, 2)
@@ -1,4 +1,5 @@
-from database.database import create_connection, add_points
+from database.database import get_connection, add_points
+from database.ledger import SOURCE_ADMIN
 
 
 def find_user_by_username(raw_username: str):
@@ -17,24 +18,20 @@ def find_user_by_username(raw_username: str):
     if not username:
         return None
 
-    conn = create_connection()
+    conn = get_connection()
     cursor = conn.cursor()
-    try:
-        cursor.execute('''
-            SELECT 
-                user_id,
-                username,
-                full_name,
-                joined_at,
-                COALESCE(points, 0) AS pts,
-                COALESCE(referrals_count, 0) AS refs
-            FROM users
-            WHERE LOWER(username) = LOWER(?)
-        ''', (username,))
-        row = cursor.fetchone()
-        return row
-    finally:
-        conn.close()
+    cursor.execute('''
+        SELECT 
+            user_id,
+            username,
+            full_name,
+            joined_at,
+            points_x10 / 10.0 AS pts,
+            COALESCE(referrals_count, 0) AS refs
+        FROM users
+        WHERE username = ? COLLATE NOCASE
+    ''', (username,))
+    return cursor.fetchone()
 
 
 def give_points_to_user(user_id: int, points: float):
@@ -43,7 +40,7 @@ def give_points_to_user(user_id: int, points: float):
     """
     if points == 0:
         return
-    add_points(user_id, points)
+    add_points(user_id, points, SOURCE_ADMIN)
 
 
 def take_points_from_user(user_id: int, points: float):
@@ -54,4 +51,4 @@ def take_points_from_user(user_id: int, points: float):
     if points == 0:
         return
     # manfiy qilib yuboramiz
-    add_points(user_id, -abs(points))
+    add_points(user_id, -abs(points), SOURCE_ADMIN)
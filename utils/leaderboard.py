@@ -0,0 +1,384 @@
+"""
+Xotiradagi reyting (🏆 Top foydalanuvchilar, "Mening ballarim", /stats).
+
+Ishga tushganda bir marta DBdan yuklanadi, keyin database.py dagi ball
+o'zgarishi tinglovchisi orqali faqat o'zgargan userlar yangilanadi.
+Tartib get_top_users bilan bir xil:
+    points_x10 DESC, referrals_count DESC, joined_at ASC, user_id ASC
+
+Saqlash: bo'laklangan saralangan ro'yxat (har bo'lak ~_BUCKET ta kalit,
+bisect bilan qidiriladi, bo'lak o'lchamlari Fenwick daraxtida) + user_id ->
+yozuv xaritasi. Top-N, o'rin va qo'shnilar SQL saralashsiz, O(log n).
+
+Fon thread vaqti-vaqti bilan DB bilan solishtiradi (drift) va tuzatadi.
+Reyting yuklanmagan bo'lsa (masalan, skriptlardan) funksiyalar to'g'ridan
+to'g'ri DBga murojaat qiladi.
+"""
+
+import threading
+import time
+from bisect import bisect_left, insort
+
+from database.database import (
+    get_connection,
+    points_from_x10,
+    add_points_listener,
+    get_top_users as db_get_top_users,
+    get_user_rank as db_get_user_rank,
+)
+
+# Sozlamalar
+LEADERBOARD_RECONCILE_SEC = 600   # DB bilan solishtirish oralig'i
+LEADERBOARD_TOP_WATCH = 10        # top_version shu N talikka tegsa o'sadi
+_BUCKET = 256                     # bo'lak o'lchami (2x bo'lsa ikkiga bo'linadi)
+
+_SELECT_USERS = '''
+    SELECT user_id, username, full_name, points_x10,
+           COALESCE(referrals_count, 0), joined_at
+    FROM users
+'''
+
+
+def _make_key(user_id, points_x10, refs, joined_at) -> tuple:
+    # joined_at NULL bo'lsa SQLdagi kabi birinchi turadi ("" har qanday sanadan kichik)
+    return (-int(points_x10 or 0), -int(refs or 0), joined_at or "", int(user_id))
+
+
+class _SortedKeys:
+    """
+    Bo'laklangan saralangan ro'yxat (faqat shu modul uchun).
+    Bo'lak o'lchamlari ustida Fenwick daraxti: o'rin va kesma O(log n).
+    """
+
+    def __init__(self, keys=()):
+        keys = sorted(keys)
+        self._buckets = [keys[i:i + _BUCKET] for i in range(0, len(keys), _BUCKET)]
+        self._maxes = [b[-1] for b in self._buckets]
+        self._len = len(keys)
+        self._build_tree()
+
+    def __len__(self):
+        return self._len
+
+    # ---- Fenwick (bo'lak o'lchamlari) ----
+
+    def _build_tree(self):
+        # bo'linish / bo'lak o'chishi kam bo'ladi - shunda to'liq qayta quriladi, O(b)
+        tree = [0] * (len(self._buckets) + 1)
+        for i, bucket in enumerate(self._buckets, start=1):
+            tree[i] += len(bucket)
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _tree_add(self, idx: int, delta: int):
+        i = idx + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_before(self, idx: int) -> int:
+        """idx dan oldingi bo'laklardagi kalitlar soni."""
+        total = 0
+        i = idx
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def _locate(self, pos: int):
+        """pos-o'rindagi kalit -> (bo'lak indeksi, bo'lak ichidagi o'rin)."""
+        idx = 0
+        step = 1 << (len(self._tree) - 1).bit_length()
+        while step:
+            nxt = idx + step
+            if nxt < len(self._tree) and self._tree[nxt] <= pos:
+                idx = nxt
+                pos -= self._tree[nxt]
+            step >>= 1
+        return idx, pos
+
+    # ---- ro'yxat ----
+
+    def _bucket_index(self, key) -> int:
+        idx = bisect_left(self._maxes, key)
+        return min(idx, len(self._buckets) - 1)
+
+    def add(self, key):
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([key])
+            self._maxes.append(key)
+            self._build_tree()
+            return
+
+        idx = self._bucket_index(key)
+        bucket = self._buckets[idx]
+        insort(bucket, key)
+        self._maxes[idx] = bucket[-1]
+
+        if len(bucket) > 2 * _BUCKET:
+            half = len(bucket) // 2
+            self._buckets[idx:idx + 1] = [bucket[:half], bucket[half:]]
+            self._maxes[idx:idx + 1] = [bucket[half - 1], bucket[-1]]
+            self._build_tree()
+        else:
+            self._tree_add(idx, 1)
+
+    def remove(self, key):
+        if not self._buckets:
+            return
+        idx = self._bucket_index(key)
+        bucket = self._buckets[idx]
+        pos = bisect_left(bucket, key)
+        if pos == len(bucket) or bucket[pos] != key:
+            return
+
+        del bucket[pos]
+        self._len -= 1
+        if bucket:
+            self._maxes[idx] = bucket[-1]
+            self._tree_add(idx, -1)
+        else:
+            del self._buckets[idx]
+            del self._maxes[idx]
+            self._build_tree()
+
+    def index(self, key) -> int:
+        """0 dan boshlangan o'rin (kalit mavjud deb hisoblanadi)."""
+        idx = self._bucket_index(key)
+        return self._count_before(idx) + bisect_left(self._buckets[idx], key)
+
+    def slice(self, start: int, stop: int) -> list:
+        result = []
+        if start >= min(stop, self._len):
+            return result
+        idx, pos = self._locate(start)
+        need = min(stop, self._len) - start
+        while need > 0 and idx < len(self._buckets):
+            part = self._buckets[idx][pos:pos + need]
+            result.extend(part)
+            need -= len(part)
+            idx, pos = idx + 1, 0
+        return result
+
+
+_lock = threading.RLock()
+_keys = None          # _SortedKeys (None -> hali yuklanmagan)
+_entries = {}         # user_id -> (key, username, full_name)
+_reconcile_thread = None
+# Top N o'zgarganda o'sadi (handlers/users/top_users.py dagi matn keshi uchun)
+_top_version = 0
+# _reload DBni o'qiyotganda o'zgargan userlar (None -> reload ketmayapti)
+_changed_during_reload = None
+
+_metrics = {
+    "loaded_at": None,
+    "updates": 0,
+    "reconciles": 0,
+    "last_drift": 0,
+    "total_drift": 0,
+    "last_reload_ms": 0.0,
+}
+
+
+def _read_all() -> dict:
+    cursor = get_connection().cursor()
+    try:
+        cursor.execute(_SELECT_USERS)
+        return {
+            row[0]: (_make_key(row[0], row[3], row[4], row[5]), row[1], row[2])
+            for row in cursor.fetchall()
+        }
+    finally:
+        cursor.close()
+
+
+def _reload() -> int:
+    """
+    DBdan to'liq qayta quradi. return: xotira bilan DB farqi (userlar soni).
+    O'qish va qurish lock tashqarisida - o'rin/top so'rovlari kutib qolmaydi;
+    shu orada o'zgargan userlar almashtirilgandan keyin qayta o'qiladi.
+    """
+    global _keys, _entries, _top_version, _changed_during_reload
+
+    started = time.perf_counter()
+    with _lock:
+        _changed_during_reload = set()
+        old_entries = dict(_entries) if _keys is not None else None
+
+    try:
+        fresh = _read_all()
+        fresh_keys = _SortedKeys(entry[0] for entry in fresh.values())
+    except Exception:
+        with _lock:
+            _changed_during_reload = None
+        raise
+
+    with _lock:
+        changed = _changed_during_reload
+        _changed_during_reload = None
+        _keys = fresh_keys
+        _entries = fresh
+        _top_version += 1
+
+    drift = 0
+    if old_entries is not None:
+        for user_id, entry in fresh.items():
+            if user_id in changed:
+                continue   # farq tinglovchidan, drift emas
+            old = old_entries.get(user_id)
+            if old is None or old[0] != entry[0]:
+                drift += 1
+        drift += sum(1 for user_id in old_entries if user_id not in fresh and user_id not in changed)
+
+    if changed:
+        _on_points_changed(changed)
+    _metrics["last_reload_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return drift
+
+
+def _touches_top(old_key, new_key) -> bool:
+    """O'zgarish top N ga ta'sir qiladimi: a'zoga tegadi yoki N-o'rindagidan o'tadi."""
+    if len(_keys) <= LEADERBOARD_TOP_WATCH:
+        return True
+    nth = _keys.slice(LEADERBOARD_TOP_WATCH - 1, LEADERBOARD_TOP_WATCH)[0]
+    return (old_key is not None and old_key <= nth) or (new_key is not None and new_key <= nth)
+
+
+def _on_points_changed(user_ids):
+    global _top_version
+
+    if _keys is None:
+        return
+    if user_ids is None:
+        _reload()
+        return
+
+    ids = list({int(u) for u in user_ids})
+    with _lock:
+        if _changed_during_reload is not None:
+            _changed_during_reload.update(ids)
+        # tinglovchi commitdan keyin chaqiriladi -> DBdagi qiymat yakuniy
+        cursor = get_connection().cursor()
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                cursor.execute(f"{_SELECT_USERS} WHERE user_id IN ({marks})", chunk)
+                found = {row[0]: row for row in cursor.fetchall()}
+
+                for user_id in chunk:
+                    row = found.get(user_id)
+                    old = _entries.get(user_id)
+                    new_entry = None
+                    if row is not None:
+                        key = _make_key(row[0], row[3], row[4], row[5])
+                        new_entry = (key, row[1], row[2])
+                    if new_entry == old:
+                        continue
+
+                    if _touches_top(old[0] if old else None, new_entry[0] if new_entry else None):
+                        _top_version += 1
+
+                    if old is not None:
+                        del _entries[user_id]
+                        _keys.remove(old[0])
+                    if new_entry is not None:
+                        _entries[user_id] = new_entry
+                        _keys.add(new_entry[0])
+        finally:
+            cursor.close()
+        _metrics["updates"] += len(ids)
+
+
+def _reconcile_loop():
+    while True:
+        time.sleep(LEADERBOARD_RECONCILE_SEC)
+        try:
+            drift = _reload()
+            _metrics["reconciles"] += 1
+            _metrics["last_drift"] = drift
+            _metrics["total_drift"] += drift
+            if drift:
+                print(f"[leaderboard] DB bilan farq topildi va tuzatildi: {drift} ta user")
+        except Exception as e:
+            print(f"[leaderboard] reconcile xatosi: {e}")
+
+
+def load_leaderboard():
+    """Ishga tushganda bir marta chaqiriladi (init_database dan keyin)."""
+    global _reconcile_thread
+
+    _reload()
+    _metrics["loaded_at"] = int(time.time())
+    add_points_listener(_on_points_changed)
+
+    if _reconcile_thread is None:
+        _reconcile_thread = threading.Thread(
+            target=_reconcile_loop, name="leaderboard-reconcile", daemon=True
+        )
+        _reconcile_thread.start()
+
+    print(f"🏆 Reyting xotiraga yuklandi: {len(_entries)} ta user ({_metrics['last_reload_ms']} ms)")
+
+
+def _row(key, username, full_name) -> tuple:
+    """get_top_users bilan bir xil ko'rinish: (user_id, username, full_name, points, refs)."""
+    return (key[3], username, full_name, points_from_x10(-key[0]), -key[1])
+
+
+def get_top_version() -> int:
+    """Top LEADERBOARD_TOP_WATCH o'zgarishi mumkin bo'lganda o'sadigan hisoblagich."""
+    return _top_version
+
+
+def is_loaded() -> bool:
+    return _keys is not None
+
+
+def get_top_users(limit: int = 10):
+    if _keys is None:
+        return db_get_top_users(limit)
+    with _lock:
+        return [_row(key, *_entries[key[3]][1:]) for key in _keys.slice(0, limit)]
+
+
+def get_user_rank(user_id: int):
+    """return: (rank | None, total_users) - database.get_user_rank bilan bir xil."""
+    if _keys is None:
+        return db_get_user_rank(user_id)
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is None:
+            return None, len(_keys)
+        return _keys.index(entry[0]) + 1, len(_keys)
+
+
+def get_neighbours(user_id: int, around: int = 2):
+    """
+    Userning atrofidagilar (o'zi ham kiradi).
+    return: [(rank, (user_id, username, full_name, points, refs)), ...]
+    """
+    if _keys is None:
+        return []
+    with _lock:
+        entry = _entries.get(user_id)
+        if entry is None:
+            return []
+        pos = _keys.index(entry[0])
+        start = max(0, pos - around)
+        keys = _keys.slice(start, pos + around + 1)
+        return [
+            (start + i + 1, _row(key, *_entries[key[3]][1:]))
+            for i, key in enumerate(keys)
+        ]
+
+
+def get_leaderboard_metrics() -> dict:
+    m = dict(_metrics)
+    m["users"] = len(_entries)
+    m["top_version"] = _top_version
+    m["buckets"] = len(_keys._buckets) if _keys is not None else 0
+    return m
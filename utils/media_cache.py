@@ -0,0 +1,138 @@
+"""
+Lokal rasmlar (images/) uchun Telegram file_id keshi.
+
+Birinchi yuborishda fayl yuklanadi va javobdagi file_id media_cache
+jadvaliga (path, size, mtime, sha256) bilan yoziladi. Keyingi safar
+fayl o'zgarmagan bo'lsa rasm file_id bilan yuboriladi - diskdan o'qish ham,
+multipart yuklash ham yo'q.
+
+  - size/mtime o'zgargan, lekin sha256 bir xil (masalan, restore) -> file_id qoladi;
+  - mazmun o'zgargan yoki Telegram file_id ni rad etsa -> qayta yuklanadi.
+"""
+
+import hashlib
+import os
+import threading
+import time
+
+from telebot.apihelper import ApiTelegramException
+
+from database.database import get_connection
+
+_entries = {}        # path -> (size, mtime_ns, sha256, file_id)
+_loaded = False
+_lock = threading.Lock()
+
+_metrics = {
+    "hits": 0,
+    "uploads": 0,
+    "rehashed": 0,
+    "rejected": 0,
+}
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _load():
+    global _loaded
+    rows = get_connection().execute(
+        "SELECT path, size, mtime_ns, sha256, file_id FROM media_cache"
+    ).fetchall()
+    with _lock:
+        for path, size, mtime_ns, sha, file_id in rows:
+            _entries[path] = (size, mtime_ns, sha, file_id)
+        _loaded = True
+
+
+def _store(path: str, size: int, mtime_ns: int, sha: str, file_id: str):
+    conn = get_connection()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO media_cache (path, size, mtime_ns, sha256, file_id, updated_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (path, size, mtime_ns, sha, file_id, int(time.time()))
+        )
+    with _lock:
+        _entries[path] = (size, mtime_ns, sha, file_id)
+
+
+def _forget(path: str):
+    conn = get_connection()
+    with conn:
+        conn.execute("DELETE FROM media_cache WHERE path = ?", (path,))
+    with _lock:
+        _entries.pop(path, None)
+
+
+def _cached_file_id(path: str, size: int, mtime_ns: int):
+    if not _loaded:
+        _load()
+    entry = _entries.get(path)
+    if entry is None:
+        return None
+    if entry[0] == size and entry[1] == mtime_ns:
+        return entry[3]
+
+    # vaqt/hajm boshqa - mazmun bir xilmi?
+    sha = _sha256(path)
+    if sha != entry[2]:
+        return None
+    _store(path, size, mtime_ns, sha, entry[3])
+    _metrics["rehashed"] += 1
+    return entry[3]
+
+
+def _is_rejected_file_id(exc: Exception) -> bool:
+    s = str(exc).lower()
+    return isinstance(exc, ApiTelegramException) and "400" in s and (
+        "file" in s or "wrong type" in s
+    )
+
+
+def send_cached_photo(bot, chat_id: int, path: str, send=None, **kwargs):
+    """
+    path dagi rasmni yuboradi (file_id bo'lsa u bilan).
+    send(photo, **kwargs) -> Message: yuboruvchi (default: bot.send_photo(chat_id, ...)).
+    Fayl yo'q bo'lsa FileNotFoundError (avvalgi open() kabi).
+    return: send() natijasi.
+    """
+    if send is None:
+        def send(photo, **kw):
+            return bot.send_photo(chat_id, photo, **kw)
+
+    path = os.path.normpath(path)
+    st = os.stat(path)
+
+    file_id = _cached_file_id(path, st.st_size, st.st_mtime_ns)
+    if file_id:
+        try:
+            result = send(file_id, **kwargs)
+            _metrics["hits"] += 1
+            return result
+        except Exception as e:
+            if not _is_rejected_file_id(e):
+                raise
+            _metrics["rejected"] += 1
+            _forget(path)
+
+    with open(path, "rb") as photo:
+        result = send(photo, **kwargs)
+    _metrics["uploads"] += 1
+
+    photos = getattr(result, "photo", None)
+    if photos:
+        _store(path, st.st_size, st.st_mtime_ns, _sha256(path), photos[-1].file_id)
+    return result
+
+
+def get_media_cache_metrics() -> dict:
+    m = dict(_metrics)
+    with _lock:
+        m["cached"] = len(_entries)
+    return m
@@ -11,14 +11,24 @@ from database.database import (
     set_points as db_set_points,
     increment_referrals as db_increment_referrals,
     get_referrals_count as db_get_referrals_count,
-    get_top_users as db_get_top_users,
     get_referrals_for_user as db_get_referrals_for_user,
 )
+from database.ledger import SOURCE_MANUAL
+from database.points_buffer import buffer_points
+from utils.leaderboard import get_top_users as lb_get_top_users
 
 
-def add_points(user_id: int, amount: int):
-    """Userga ball qo'shish"""
-    db_add_points(user_id, amount)
+def add_points(user_id: int, amount: int, source: str = SOURCE_MANUAL):
+    """Userga ball qo'shish (source: jurnal uchun manba)"""
+    db_add_points(user_id, amount, source)
+
+
+def add_points_buffered(user_id: int, amount, source: str):
+    """
+    Tez-tez keladigan kichik ballar uchun (quiz, tezkor so'zlar):
+    DBga darhol emas, bufer orqali guruh bilan yoziladi.
+    """
+    buffer_points(user_id, amount, source)
 
 
 def get_points(user_id: int) -> int:
@@ -26,9 +36,9 @@ def get_points(user_id: int) -> int:
     return db_get_points(user_id)
 
 
-def set_points(user_id: int, value: int):
+def set_points(user_id: int, value: int, source: str = SOURCE_MANUAL):
     """User ballini to'g'ridan to'g'ri o'rnatish"""
-    db_set_points(user_id, value)
+    db_set_points(user_id, value, source)
 
 
 def increment_referrals(user_id: int):
@@ -42,8 +52,8 @@ def get_referrals_count(user_id: int) -> int:
 
 
 def get_top_users(limit: int = 10):
-    """Top foydalanuvchilarni olish"""
-    return db_get_top_users(limit)
+    """Top foydalanuvchilarni olish (xotiradagi reytingdan)"""
+    return lb_get_top_users(limit)
 
 
 def get_user_referrals(referrer_id: int):
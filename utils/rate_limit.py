@@ -0,0 +1,50 @@
+"""
+Token bucket: Telegram API chaqiruvlarini sekundiga N tadan oshirmaslik uchun
+(fon ishlari - referral sweeper va h.k. bir nechta threaddan foydalanadi).
+"""
+
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    rate - sekundiga qo'shiladigan token, capacity - bir zumda olinishi mumkin
+    bo'lgan eng ko'p token (burst). Thread-safe.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_sec = 0.0     # acquire() da jami kutilgan vaqt (metrika)
+        self.acquired = 0.0       # jami berilgan tokenlar (metrika)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                self.acquired += tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1):
+        """Token bo'lguncha kutadi."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    self.acquired += tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+                self.waited_sec += wait
+            time.sleep(wait)
@@ -0,0 +1,155 @@
+"""
+Pending referrallarni fonda faollashtirish.
+
+Odatda bonus faqat taklif qilingan user "✅ Bonusni faollashtirish" ni bossa
+yoki /start ni qayta yuborsa beriladi - qolganlari pending_referrals da abadiy
+qolib ketadi. Bu thread har SWEEP_INTERVAL_SEC da jadvalni PK bo'yicha
+partiyalab aylanadi:
+  - obunani cheklangan pool (SWEEP_WORKERS) va token bucket (SWEEP_RATE/s) bilan tekshiradi
+    (token faqat haqiqiy API chaqiruvda olinadi - kesh / chat_member holati bepul),
+  - obuna bo'lganlarni activate_pending_referral orqali faollashtiradi (+ referrerga xabar),
+  - PENDING_EXPIRE_DAYS dan eskilarini o'chiradi.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database.database import (
+    get_pending_referrals_batch,
+    expire_pending_referrals,
+    activate_pending_referral,
+)
+from utils.rate_limit import TokenBucket
+from utils.subscription import is_subscribed
+
+# Sozlamalar
+SWEEP_INTERVAL_SEC = 15 * 60     # sweep oralig'i
+SWEEP_FIRST_DELAY_SEC = 60       # ishga tushgandan keyin birinchi sweep
+SWEEP_BATCH = 200                # DBdan bir martada o'qiladigan pendinglar
+SWEEP_WORKERS = 4                # bir vaqtda ketayotgan API chaqiruvlar
+SWEEP_RATE = 10                  # API chaqiruv / sekund (botning asosiy ishiga joy qolsin)
+PENDING_EXPIRE_DAYS = 30         # shundan eski pending o'chiriladi
+REFERRAL_BONUS = 200
+
+_bucket = TokenBucket(SWEEP_RATE)
+_sweep_lock = threading.Lock()
+_sweeper_thread = None
+
+_metrics = {
+    "sweeps": 0,
+    "checked": 0,
+    "activated": 0,
+    "expired": 0,
+    "errors": 0,
+    "last_sweep_at": None,
+    "last_sweep_sec": 0.0,
+    "last_rate_per_sec": 0.0,   # tekshirilgan pending / sekund
+}
+_metrics_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _metrics_lock:
+        for key, value in deltas.items():
+            _metrics[key] += value
+
+
+def _check_one(bot, referred_id: int) -> bool:
+    """Bitta pending: obuna -> faollashtirish -> xabar. return: bonus berildimi."""
+    from handlers.users.referrals import notify_referrer
+
+    _count(checked=1)
+    if not is_subscribed(bot, referred_id, bucket=_bucket):
+        return False
+
+    referrer_id = activate_pending_referral(referred_id, bonus_points=REFERRAL_BONUS)
+    if referrer_id is None:
+        return False
+
+    _count(activated=1)
+    notify_referrer(bot, referrer_id, referred_id, REFERRAL_BONUS, bucket=_bucket)
+    return True
+
+
+def sweep_pending_referrals(bot) -> dict:
+    """
+    Bitta to'liq aylanish. Bir vaqtda faqat bittasi ishlaydi.
+    return: shu sweep natijasi (checked, activated, expired, api_calls, elapsed_sec).
+    """
+    if not _sweep_lock.acquire(blocking=False):
+        return {}
+
+    started = time.perf_counter()
+    before = get_sweeper_metrics()
+    try:
+        expired = expire_pending_referrals(PENDING_EXPIRE_DAYS)
+        _count(expired=expired)
+
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=SWEEP_WORKERS, thread_name_prefix="ref-sweep") as pool:
+            while True:
+                batch = get_pending_referrals_batch(last_id, SWEEP_BATCH)
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                futures = [pool.submit(_check_one, bot, referred_id) for referred_id, _ in batch]
+                for future in futures:
+                    try:
+                        future.result()
+                    except Exception as e:
+                        _count(errors=1)
+                        print(f"[referral-sweeper] xatolik: {e}")
+    finally:
+        _sweep_lock.release()
+
+    elapsed = time.perf_counter() - started
+    after = get_sweeper_metrics()
+    result = {
+        key: after[key] - before[key]
+        for key in ("checked", "activated", "expired", "api_calls", "errors")
+    }
+    result["elapsed_sec"] = round(elapsed, 2)
+
+    with _metrics_lock:
+        _metrics["sweeps"] += 1
+        _metrics["last_sweep_at"] = int(time.time())
+        _metrics["last_sweep_sec"] = result["elapsed_sec"]
+        _metrics["last_rate_per_sec"] = round(result["checked"] / elapsed, 2) if elapsed else 0.0
+    return result
+
+
+def _sweep_loop(bot):
+    time.sleep(SWEEP_FIRST_DELAY_SEC)
+    while True:
+        try:
+            result = sweep_pending_referrals(bot)
+            if result.get("checked") or result.get("expired"):
+                print(
+                    f"[referral-sweeper] tekshirildi: {result['checked']}, "
+                    f"faollashdi: {result['activated']}, o'chirildi: {result['expired']}, "
+                    f"API: {result['api_calls']}, {result['elapsed_sec']} s"
+                )
+        except Exception as e:
+            print(f"[referral-sweeper] sweep xatosi: {e}")
+        time.sleep(SWEEP_INTERVAL_SEC)
+
+
+def start_referral_sweeper(bot):
+    """main.py dan bir marta chaqiriladi (init_database dan keyin)."""
+    global _sweeper_thread
+    if _sweeper_thread is None:
+        _sweeper_thread = threading.Thread(
+            target=_sweep_loop, args=(bot,), name="referral-sweeper", daemon=True
+        )
+        _sweeper_thread.start()
+
+
+def get_sweeper_metrics() -> dict:
+    with _metrics_lock:
+        m = dict(_metrics)
+    # API chaqiruvlar = bucketdan olingan tokenlar (bucket faqat sweeper niki)
+    m["api_calls"] = int(_bucket.acquired)
+    m["rate_waited_sec"] = round(_bucket.waited_sec, 2)
+    return m
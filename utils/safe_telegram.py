@@ -1,10 +1,12 @@
 # utils/safe_telegram.py
 import time
 import json
+import functools
 import threading
 from collections import deque
 from typing import Optional, Any
 
+import telebot
 from telebot.apihelper import ApiTelegramException
 
 
@@ -42,7 +44,7 @@ def _now() -> float:
     return time.time()
 
 
-def _extract_retry_after(exc: ApiTelegramException) -> int:
+def extract_retry_after(exc: ApiTelegramException) -> int:
     try:
         rj = getattr(exc, "result_json", None)
         if isinstance(rj, str):
@@ -112,6 +114,57 @@ def _maybe_warn(bot, chat_id: int, user_id: Optional[int] = None):
         pass
 
 
+def _is_forbidden(exc: ApiTelegramException) -> bool:
+    s = str(exc)
+    return "403" in s or "blocked by the user" in s or "Forbidden" in s
+
+
+def _record_unreachable(chat_id):
+    """403 -> users.reachable = 0 (e'lonlar endi unga yuborilmaydi). Faqat shaxsiy chatlar."""
+    from database.database import mark_users_unreachable
+
+    if isinstance(chat_id, int) and chat_id > 0:
+        mark_users_unreachable([chat_id])
+
+
+# =========================
+# Bot: har bir yuborishda 403 ni qayd qilish
+# =========================
+
+# chat_id birinchi argument bo'lgan yuborish metodlari
+_SEND_METHODS = (
+    "send_message", "send_photo", "send_document", "send_video", "send_animation",
+    "send_audio", "send_voice", "send_video_note", "send_sticker", "send_media_group",
+    "send_location", "send_contact", "send_poll", "send_dice",
+    "copy_message", "forward_message",
+)
+
+
+def _records_unreachable(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except ApiTelegramException as e:
+            if _is_forbidden(e):
+                _record_unreachable(kwargs["chat_id"] if "chat_id" in kwargs else args[0])
+            raise
+    return wrapper
+
+
+class ReachabilityTeleBot(telebot.TeleBot):
+    """
+    TeleBot, lekin yuborish 403 (botni bloklagan / akkaunt o'chirilgan) bilan
+    tugasa user yetkazib bo'lmaydigan deb belgilanadi - to'g'ridan-to'g'ri
+    bot.send_message chaqiruvlari ham. Xato odatdagidek qayta ko'tariladi.
+    """
+
+
+for _name in _SEND_METHODS:
+    if hasattr(telebot.TeleBot, _name):
+        setattr(ReachabilityTeleBot, _name, _records_unreachable(getattr(telebot.TeleBot, _name)))
+
+
 # =========================
 # Public safe wrappers
 # =========================
@@ -147,13 +200,13 @@ def safe_send_message(
         except ApiTelegramException as e:
             s = str(e)
 
-            # user block qilgan / yozib bo'lmaydi
-            if "403" in s or "blocked by the user" in s or "Forbidden" in s:
+            # user block qilgan / yozib bo'lmaydi (reachable ni bot o'zi yozadi)
+            if _is_forbidden(e):
                 return False if return_bool else None
 
             # flood limit
             if "429" in s or "Too Many Requests" in s:
-                time.sleep(_extract_retry_after(e) + 1)
+                time.sleep(extract_retry_after(e) + 1)
                 continue
 
             raise
@@ -188,10 +241,10 @@ def safe_send_photo(
 
         except ApiTelegramException as e:
             s = str(e)
-            if "403" in s or "blocked by the user" in s or "Forbidden" in s:
+            if _is_forbidden(e):
                 return False if return_bool else None
             if "429" in s or "Too Many Requests" in s:
-                time.sleep(_extract_retry_after(e) + 1)
+                time.sleep(extract_retry_after(e) + 1)
                 continue
             raise
 
@@ -230,7 +283,7 @@ def safe_answer_callback(
         except ApiTelegramException as e:
             s = str(e)
             if "429" in s or "Too Many Requests" in s:
-                time.sleep(_extract_retry_after(e) + 1)
+                time.sleep(extract_retry_after(e) + 1)
                 continue
             # callback fail bo'lsa ham yiqilmaymiz
             return False
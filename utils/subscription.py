@@ -0,0 +1,160 @@
+"""
+Kanalga obuna holati (CHANNEL_USERNAME) - bitta servis.
+
+bot.get_chat_member har chaqiruvda Bot API ga bloklovchi so'rov. Shu sababli:
+  - natija TTL bilan keshlanadi: obuna bo'lganlar SUB_TTL_MEMBER, bo'lmaganlar
+    SUB_TTL_NOT_MEMBER (qisqaroq - obuna bo'lgan zahoti sezilsin);
+  - bitta user uchun bir vaqtdagi so'rovlar birlashtiriladi (bittasi API ga
+    boradi, qolganlari uning natijasini kutadi);
+  - "✅ Tekshirish" bosilganda invalidate_subscription() keshni va kanal
+    holatini o'chiradi.
+API xatosi keshlanmaydi (False qaytadi, keyingi chaqiruv qayta so'raydi).
+
+Holat chat_member update'laridan ma'lum va eskirmagan bo'lsa
+(utils/channel_members.py) API ga umuman murojaat qilinmaydi; API natijasi
+ham o'sha yerga yoziladi.
+"""
+
+import threading
+import time
+
+from config import CHANNEL_USERNAME
+from utils.channel_members import (
+    MEMBER_STATUSES,
+    get_channel_status,
+    record_channel_status,
+    forget_channel_status,
+)
+
+# Sozlamalar
+SUB_TTL_MEMBER = 10 * 60        # obuna bo'lgan - 10 daqiqa
+SUB_TTL_NOT_MEMBER = 30         # obuna bo'lmagan - 30 soniya
+SUB_WAIT_SEC = 15               # birlashtirilgan so'rovni kutish chegarasi
+
+_cache = {}        # user_id -> (is_member, expires_at)
+_inflight = {}     # user_id -> _Lookup
+_lock = threading.Lock()
+_last_prune = time.monotonic()
+
+_metrics = {
+    "hits": 0,
+    "misses": 0,
+    "coalesced": 0,
+    "api_calls": 0,
+    "errors": 0,
+    "invalidations": 0,
+    "channel_hits": 0,
+}
+
+
+class _Lookup:
+    """Bitta user uchun ketayotgan API so'rovi (kutuvchilar natijani shu yerdan oladi)."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = False
+
+
+def channel_identifier() -> str:
+    return CHANNEL_USERNAME if CHANNEL_USERNAME.startswith("@") else f"@{CHANNEL_USERNAME}"
+
+
+def _fetch(bot, user_id: int):
+    """return: True/False yoki None (API xatosi)."""
+    try:
+        member = bot.get_chat_member(channel_identifier(), user_id)
+    except Exception as e:
+        print(f"Obuna tekshirish xatosi: {e}")
+        return None
+
+    is_member = member.status in MEMBER_STATUSES
+    try:
+        record_channel_status(user_id, is_member, member.status)
+    except Exception as e:
+        print(f"Kanal a'zoligini yozishda xatolik: {e}")
+    return is_member
+
+
+def set_subscription(user_id: int, is_member: bool):
+    """Holat boshqa manbadan aniq bo'lganda keshga yozadi."""
+    ttl = SUB_TTL_MEMBER if is_member else SUB_TTL_NOT_MEMBER
+    with _lock:
+        _cache[user_id] = (is_member, time.monotonic() + ttl)
+
+
+def invalidate_subscription(user_id: int):
+    forget_channel_status(user_id)
+    with _lock:
+        _cache.pop(user_id, None)
+        _metrics["invalidations"] += 1
+
+
+def _prune_locked():
+    # muddati o'tganlar SUB_TTL_MEMBER da bir marta tozalanadi (_lock ushlangan holda)
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < SUB_TTL_MEMBER:
+        return
+    _last_prune = now
+    for user_id in [u for u, (_, exp) in _cache.items() if exp <= now]:
+        del _cache[user_id]
+
+
+def is_subscribed(bot, user_id: int, bucket=None) -> bool:
+    """
+    Foydalanuvchi kanalga obunami (keshlangan).
+    bucket (TokenBucket, fon ishlari uchun): token faqat haqiqiy API so'rovidan oldin olinadi.
+    """
+    known = get_channel_status(user_id)
+    if known is not None:
+        with _lock:
+            _metrics["channel_hits"] += 1
+        return known
+
+    with _lock:
+        cached = _cache.get(user_id)
+        if cached is not None and cached[1] > time.monotonic():
+            _metrics["hits"] += 1
+            return cached[0]
+
+        lookup = _inflight.get(user_id)
+        if lookup is not None:
+            _metrics["coalesced"] += 1
+            leader = False
+        else:
+            lookup = _inflight[user_id] = _Lookup()
+            _metrics["misses"] += 1
+            leader = True
+
+    if not leader:
+        lookup.done.wait(SUB_WAIT_SEC)
+        return lookup.result
+
+    result = None
+    try:
+        if bucket is not None:
+            bucket.acquire()
+        result = _fetch(bot, user_id)
+    finally:
+        with _lock:
+            _metrics["api_calls"] += 1
+            if result is None:
+                _metrics["errors"] += 1
+            else:
+                ttl = SUB_TTL_MEMBER if result else SUB_TTL_NOT_MEMBER
+                _cache[user_id] = (result, time.monotonic() + ttl)
+            del _inflight[user_id]
+            _prune_locked()
+        lookup.result = bool(result)
+        lookup.done.set()
+    return bool(result)
+
+
+def get_subscription_metrics() -> dict:
+    with _lock:
+        m = dict(_metrics)
+        m["cached"] = len(_cache)
+    lookups = m["channel_hits"] + m["hits"] + m["misses"] + m["coalesced"]
+    served = m["channel_hits"] + m["hits"] + m["coalesced"]
+    m["hit_rate"] = round(served * 100 / lookups, 1) if lookups else 0.0
+    return m